@@ -8,7 +8,8 @@ from alembic import context
 config = context.config
 
 # Interpret the config file for Python logging
-if config.config_file_name is not None:
+# (при запуске из приложения логирование уже настроено — не перетираем его)
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
     fileConfig(config.config_file_name)
 
 # URL для sync-движка (миграции)
@@ -49,6 +50,18 @@ def run_migrations_offline():
 def run_migrations_online():
     """Run migrations in 'online' mode."""
 
+    # Соединение передано вызывающим кодом (app.migrations) — работаем в нём
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            compare_type=True,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     # Создаем движок с дополнительными настройками
     connectable = create_engine(
         ALEMBIC_DATABASE_URL,
@@ -0,0 +1,180 @@
+"""cluster_registry: derived metrics maintained from queries
+
+Revision ID: 028_cluster_registry_derived
+Revises: 027_tz
+Create Date: 2026-10-19 00:00:00
+
+demand / has_core / is_published больше не вводятся руками — их ведут
+триггеры на queries дельтами (statement-level, через transition tables):
+  demand       = SUM(ws_flag) по запросам кластера
+  has_core     = queries_count > 0
+  is_published = pages_count > 0 (есть запросы с заполненной страницей)
+"""
+from alembic import op
+
+revision = "028_cluster_registry_derived"
+down_revision = "027_tz"
+branch_labels = None
+depends_on = None
+
+PAGE_SET = "(NULLIF(BTRIM({t}.page), '') IS NOT NULL)"
+
+
+def upgrade():
+    # Счётчики, из которых выводятся has_core / is_published
+    op.execute("""
+        ALTER TABLE cluster_registry
+            ADD COLUMN IF NOT EXISTS queries_count integer NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS pages_count integer NOT NULL DEFAULT 0;
+    """)
+
+    # Поиск запросов кластера (сид новых строк реестра, бэкофилл)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_queries_cluster_id ON queries (cluster_id);")
+
+    # Дельты по запросам -> реестр
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION trg_queries_cluster_registry()
+    RETURNS trigger AS $$
+    DECLARE
+      src text;
+    BEGIN
+      IF TG_OP = 'INSERT' THEN
+        src := $s$SELECT n.project_id, n.cluster_id, 1 AS sgn, n.ws_flag, {PAGE_SET.format(t="n")} AS has_page
+                FROM new_rows n$s$;
+      ELSIF TG_OP = 'DELETE' THEN
+        src := $s$SELECT o.project_id, o.cluster_id, -1 AS sgn, o.ws_flag, {PAGE_SET.format(t="o")} AS has_page
+                FROM old_rows o$s$;
+      ELSE
+        src := $s$SELECT n.project_id, n.cluster_id, 1 AS sgn, n.ws_flag, {PAGE_SET.format(t="n")} AS has_page
+                FROM new_rows n JOIN old_rows o ON o.id = n.id
+                WHERE (o.project_id, o.cluster_id, o.ws_flag, o.page)
+                      IS DISTINCT FROM (n.project_id, n.cluster_id, n.ws_flag, n.page)
+                UNION ALL
+                SELECT o.project_id, o.cluster_id, -1 AS sgn, o.ws_flag, {PAGE_SET.format(t="o")} AS has_page
+                FROM old_rows o JOIN new_rows n ON n.id = o.id
+                WHERE (o.project_id, o.cluster_id, o.ws_flag, o.page)
+                      IS DISTINCT FROM (n.project_id, n.cluster_id, n.ws_flag, n.page)$s$;
+      END IF;
+
+      EXECUTE format($q$
+        UPDATE cluster_registry cr
+        SET queries_count = cr.queries_count + d.cnt,
+            pages_count   = cr.pages_count + d.pages,
+            demand        = cr.demand + d.ws,
+            has_core      = (cr.queries_count + d.cnt) > 0,
+            is_published  = (cr.pages_count + d.pages) > 0,
+            updated_at    = now()
+        FROM (
+          SELECT s.project_id, c.name,
+                 SUM(s.sgn)::int AS cnt,
+                 SUM(s.sgn * COALESCE(s.ws_flag, 0))::int AS ws,
+                 SUM(CASE WHEN s.has_page THEN s.sgn ELSE 0 END)::int AS pages
+          FROM (%s) s
+          JOIN clusters c ON c.id = s.cluster_id
+          GROUP BY s.project_id, c.name
+        ) d
+        WHERE cr.project_id = d.project_id
+          AND cr.name = d.name
+          AND (d.cnt <> 0 OR d.ws <> 0 OR d.pages <> 0)
+      $q$, src);
+
+      RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+    DROP TRIGGER IF EXISTS trg_queries_cluster_registry_ins ON queries;
+    DROP TRIGGER IF EXISTS trg_queries_cluster_registry_upd ON queries;
+    DROP TRIGGER IF EXISTS trg_queries_cluster_registry_del ON queries;
+
+    CREATE TRIGGER trg_queries_cluster_registry_ins
+      AFTER INSERT ON queries
+      REFERENCING NEW TABLE AS new_rows
+      FOR EACH STATEMENT EXECUTE FUNCTION trg_queries_cluster_registry();
+
+    CREATE TRIGGER trg_queries_cluster_registry_upd
+      AFTER UPDATE ON queries
+      REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+      FOR EACH STATEMENT EXECUTE FUNCTION trg_queries_cluster_registry();
+
+    CREATE TRIGGER trg_queries_cluster_registry_del
+      AFTER DELETE ON queries
+      REFERENCING OLD TABLE AS old_rows
+      FOR EACH STATEMENT EXECUTE FUNCTION trg_queries_cluster_registry();
+    """)
+
+    # Новые строки реестра сразу получают метрики уже существующих запросов
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION trg_cluster_registry_seed()
+    RETURNS trigger AS $$
+    BEGIN
+      UPDATE cluster_registry cr
+      SET queries_count = a.cnt,
+          pages_count   = a.pages,
+          demand        = a.ws,
+          has_core      = a.cnt > 0,
+          is_published  = a.pages > 0
+      FROM (
+        SELECT n.id,
+               COUNT(q.id)::int AS cnt,
+               COALESCE(SUM(q.ws_flag), 0)::int AS ws,
+               (COUNT(q.id) FILTER (WHERE {PAGE_SET.format(t="q")}))::int AS pages
+        FROM new_rows n
+        LEFT JOIN clusters c ON c.project_id = n.project_id AND c.name = n.name
+        LEFT JOIN queries q ON q.cluster_id = c.id
+        GROUP BY n.id
+      ) a
+      WHERE cr.id = a.id
+        AND (cr.queries_count, cr.pages_count, cr.demand, cr.has_core, cr.is_published)
+            IS DISTINCT FROM (a.cnt, a.pages, a.ws, a.cnt > 0, a.pages > 0);
+      RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+    DROP TRIGGER IF EXISTS trg_cluster_registry_seed ON cluster_registry;
+    CREATE TRIGGER trg_cluster_registry_seed
+      AFTER INSERT ON cluster_registry
+      REFERENCING NEW TABLE AS new_rows
+      FOR EACH STATEMENT EXECUTE FUNCTION trg_cluster_registry_seed();
+    """)
+
+    # Разовый бэкофилл (повторно: python -m app.tools.backfill_registry)
+    op.execute(f"""
+        UPDATE cluster_registry cr
+        SET queries_count = COALESCE(a.cnt, 0),
+            pages_count   = COALESCE(a.pages, 0),
+            demand        = COALESCE(a.ws, 0),
+            has_core      = COALESCE(a.cnt, 0) > 0,
+            is_published  = COALESCE(a.pages, 0) > 0
+        FROM cluster_registry r
+        LEFT JOIN (
+            SELECT q.project_id, c.name,
+                   COUNT(*)::int AS cnt,
+                   COALESCE(SUM(q.ws_flag), 0)::int AS ws,
+                   (COUNT(*) FILTER (WHERE {PAGE_SET.format(t="q")}))::int AS pages
+            FROM queries q
+            JOIN clusters c ON c.id = q.cluster_id
+            GROUP BY q.project_id, c.name
+        ) a ON a.project_id = r.project_id AND a.name = r.name
+        WHERE cr.id = r.id;
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_cluster_registry_seed ON cluster_registry;")
+    op.execute("DROP FUNCTION IF EXISTS trg_cluster_registry_seed();")
+    op.execute("""
+    DROP TRIGGER IF EXISTS trg_queries_cluster_registry_ins ON queries;
+    DROP TRIGGER IF EXISTS trg_queries_cluster_registry_upd ON queries;
+    DROP TRIGGER IF EXISTS trg_queries_cluster_registry_del ON queries;
+    """)
+    op.execute("DROP FUNCTION IF EXISTS trg_queries_cluster_registry();")
+    op.execute("DROP INDEX IF EXISTS ix_queries_cluster_id;")
+    op.execute("""
+        ALTER TABLE cluster_registry
+            DROP COLUMN IF EXISTS pages_count,
+            DROP COLUMN IF EXISTS queries_count;
+    """)
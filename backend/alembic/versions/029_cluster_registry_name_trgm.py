@@ -0,0 +1,25 @@
+"""cluster_registry: trigram index for name search
+
+Revision ID: 029_cluster_registry_name_trgm
+Revises: 028_cluster_registry_derived
+Create Date: 2026-10-19 00:00:00
+"""
+from alembic import op
+
+revision = "029_cluster_registry_name_trgm"
+down_revision = "028_cluster_registry_derived"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    # ILIKE '%…%' по названию кластера в /cluster-registry?search=
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_cluster_registry_name_trgm
+        ON cluster_registry USING gin (name gin_trgm_ops);
+    """)
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_cluster_registry_name_trgm;")
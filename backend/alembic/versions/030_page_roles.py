@@ -0,0 +1,40 @@
+"""Create table page_roles
+
+Revision ID: 030_page_roles
+Revises: 029_cluster_registry_name_trgm
+Create Date: 2026-10-19 00:00:00
+
+Роли на страницах раньше жили в памяти процесса (access.user_page_roles) и
+терялись при рестарте / расходились между воркерами. Теперь — таблица.
+"""
+from alembic import op
+
+revision = "030_page_roles"
+down_revision = "029_cluster_registry_name_trgm"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS page_roles (
+            id UUID PRIMARY KEY,
+            user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            page VARCHAR(50) NOT NULL,
+            role VARCHAR(20) NOT NULL DEFAULT 'viewer',
+            project_id UUID NULL REFERENCES projects(id) ON DELETE CASCADE,
+            created_at TIMESTAMPTZ DEFAULT now(),
+            updated_at TIMESTAMPTZ DEFAULT now(),
+            CONSTRAINT uq_user_page_project UNIQUE (user_id, page, project_id)
+        );
+    """)
+    # UNIQUE с NULL в project_id не срабатывает — отдельный индекс для ролей на всю страницу
+    op.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_page_roles_user_page_global
+        ON page_roles (user_id, page) WHERE project_id IS NULL;
+    """)
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS uq_page_roles_user_page_global;")
+    op.execute("DROP TABLE IF EXISTS page_roles;")
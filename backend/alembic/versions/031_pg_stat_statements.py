@@ -0,0 +1,34 @@
+"""Enable pg_stat_statements
+
+Revision ID: 031_pg_stat_statements
+Revises: 030_page_roles
+Create Date: 2026-10-19 00:00:00
+
+Для /admin/db/top-queries. Сама статистика собирается, только если
+библиотека в shared_preload_libraries (docker-compose.prod.yml); без пакета
+расширения или прав на CREATE EXTENSION миграция ничего не делает.
+"""
+from alembic import op
+
+revision = "031_pg_stat_statements"
+down_revision = "030_page_roles"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_stat_statements') THEN
+                CREATE EXTENSION IF NOT EXISTS pg_stat_statements;
+            END IF;
+        EXCEPTION WHEN insufficient_privilege THEN
+            RAISE NOTICE 'pg_stat_statements: нет прав на CREATE EXTENSION, пропускаем';
+        END
+        $$;
+    """)
+
+
+def downgrade():
+    op.execute("DROP EXTENSION IF EXISTS pg_stat_statements;")
@@ -0,0 +1,31 @@
+"""content_plan_items: indexes for keyset listing
+
+Revision ID: 032_content_plan_list_index
+Revises: 031_pg_stat_statements
+Create Date: 2026-10-19 00:00:00
+
+GET /content-plan сортирует по (created_at DESC, id DESC) и листает курсором
+по той же паре — с project_id и без него.
+"""
+from alembic import op
+
+revision = "032_content_plan_list_index"
+down_revision = "031_pg_stat_statements"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_content_plan_items_project_created
+        ON content_plan_items (project_id, created_at, id);
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_content_plan_items_created
+        ON content_plan_items (created_at, id);
+    """)
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_content_plan_items_created;")
+    op.execute("DROP INDEX IF EXISTS ix_content_plan_items_project_created;")
@@ -0,0 +1,54 @@
+"""content_plan_items: full-text and trigram search columns
+
+Revision ID: 033_content_plan_search
+Revises: 032_content_plan_list_index
+Create Date: 2026-10-19 00:00:00
+
+search_tsv — взвешенный tsvector (тема A, раздел/направление B, meta_seo/комментарий C,
+автор D) для поиска по словам с морфологией; search_text — те же поля одной строкой
+под trigram-индекс, чтобы ILIKE '%…%' по подстроке тоже шёл по индексу.
+Обе колонки генерируются Postgres'ом, приложение их не пишет.
+"""
+from alembic import op
+
+revision = "033_content_plan_search"
+down_revision = "032_content_plan_list_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    op.execute("""
+        ALTER TABLE content_plan_items
+        ADD COLUMN IF NOT EXISTS search_tsv tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('russian', coalesce(topic, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(section, '') || ' ' || coalesce(direction, '')), 'B') ||
+            setweight(to_tsvector('russian', coalesce(meta_seo, '') || ' ' || coalesce(comment, '')), 'C') ||
+            setweight(to_tsvector('simple', coalesce(author, '')), 'D')
+        ) STORED;
+    """)
+    # поля через перевод строки — подстрока из поиска не склеит два соседних поля
+    op.execute("""
+        ALTER TABLE content_plan_items
+        ADD COLUMN IF NOT EXISTS search_text text GENERATED ALWAYS AS (
+            coalesce(topic, '') || E'\\n' || coalesce(section, '') || E'\\n' ||
+            coalesce(direction, '') || E'\\n' || coalesce(comment, '') || E'\\n' ||
+            coalesce(meta_seo, '') || E'\\n' || coalesce(author, '')
+        ) STORED;
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_content_plan_items_search_tsv
+        ON content_plan_items USING gin (search_tsv);
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_content_plan_items_search_trgm
+        ON content_plan_items USING gin (search_text gin_trgm_ops);
+    """)
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_content_plan_items_search_trgm;")
+    op.execute("DROP INDEX IF EXISTS ix_content_plan_items_search_tsv;")
+    op.execute("ALTER TABLE content_plan_items DROP COLUMN IF EXISTS search_text;")
+    op.execute("ALTER TABLE content_plan_items DROP COLUMN IF EXISTS search_tsv;")
@@ -0,0 +1,40 @@
+"""content_plan_items: dedup key for import
+
+Revision ID: 034_content_plan_dedup_key
+Revises: 033_content_plan_search
+Create Date: 2026-10-19 00:00:00
+
+dedup_key — md5 от (project_id, topic, period, direction, section): по нему
+POST /content-plan/import находит уже существующие темы одним запросом.
+Индекс не уникальный — в старых данных дубли есть (аналитика их схлопывает).
+Поэтому «SELECT дублей, потом INSERT» сам по себе гоночный: два параллельных
+(или повторно отправленных) импорта вставили бы одни и те же темы. Импорт
+берёт pg_advisory_xact_lock на каждый затронутый проект до проверки дублей.
+"""
+from alembic import op
+
+revision = "034_content_plan_dedup_key"
+down_revision = "033_content_plan_search"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        ALTER TABLE content_plan_items
+        ADD COLUMN IF NOT EXISTS dedup_key varchar(32) GENERATED ALWAYS AS (
+            md5(
+                coalesce(project_id::text, '') || chr(31) || coalesce(topic, '') || chr(31) ||
+                coalesce(period, '') || chr(31) || coalesce(direction, '') || chr(31) || coalesce(section, '')
+            )
+        ) STORED;
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_content_plan_items_dedup_key
+        ON content_plan_items (dedup_key);
+    """)
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_content_plan_items_dedup_key;")
+    op.execute("ALTER TABLE content_plan_items DROP COLUMN IF EXISTS dedup_key;")
@@ -0,0 +1,23 @@
+"""users.permissions_version for cross-worker permission cache invalidation
+
+Revision ID: 035_permissions_version
+Revises: 034_content_plan_dedup_key
+Create Date: 2026-10-19 00:00:00
+
+Снимок прав кэшируется в каждом воркере; счётчик в БД увеличивается в той же
+транзакции, что и изменение прав, и сверяется при каждом обращении к кэшу.
+"""
+from alembic import op
+
+revision = "035_permissions_version"
+down_revision = "034_content_plan_dedup_key"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS permissions_version integer NOT NULL DEFAULT 0;")
+
+
+def downgrade():
+    op.execute("ALTER TABLE users DROP COLUMN IF EXISTS permissions_version;")
@@ -17,10 +17,31 @@ class Settings(BaseSettings):
     DATABASE_URL: str = "postgresql+asyncpg://app:app@db:5432/keywordhub"
     ALEMBIC_DATABASE_URL: str = "postgresql+psycopg2://app:app@db:5432/keywordhub"
 
+    # Пул соединений к БД (на процесс/воркер)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_RECYCLE: int = 3600
+    DB_POOL_TIMEOUT: float = 30.0
+    # Сколько соединений открыть заранее при старте (0 — не прогревать)
+    DB_POOL_PREWARM: int = 5
+
     # JWT
     SECRET_KEY: str = "change-me-in-.env-this-is-not-secure"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 12  # 12 часов
 
+    # bcrypt: work factor (при смене старые хэши перехэшируются на логине)
+    # и размер отдельного пула потоков для хэширования
+    BCRYPT_ROUNDS: int = 12
+    BCRYPT_MAX_WORKERS: int = 2
+
+    # Кэш авторизованных пользователей (на процесс); 0 — отключить
+    USER_CACHE_TTL_SECONDS: float = 30.0
+    USER_CACHE_MAX_SIZE: int = 2048
+    # Снимок прав (страницы + роли в проектах); актуальность сверяется с
+    # users.permissions_version при каждом обращении, TTL лишь ограничивает память
+    PERMISSION_CACHE_TTL_SECONDS: float = 60.0
+    PERMISSION_CACHE_MAX_SIZE: int = 2048
+
     # Настройки для парсера врачей
     PARSER_MAX_CONCURRENT_TASKS: int = 5
     PARSER_DEFAULT_DELAY: float = 2.0
@@ -37,6 +58,15 @@ class Settings(BaseSettings):
 
     # Логирование
     LOG_LEVEL: str = "INFO"
+    # Доля частых DEBUG-событий (решения о доступе и т.п.), попадающих в лог
+    LOG_SAMPLE_RATE: float = 0.1
+
+    # Заголовок Server-Timing (число SQL и время в БД на запрос)
+    SERVER_TIMING_ENABLED: bool = True
+    # Отладка N+1: предупреждение, если одно и то же SQL-выражение
+    # выполнилось в запросе больше SQL_REPEAT_THRESHOLD раз
+    SQL_DEBUG: bool = False
+    SQL_REPEAT_THRESHOLD: int = 10
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -2,6 +2,7 @@ from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, Asyn
 from sqlalchemy.orm import declarative_base
 from sqlalchemy import text
 from .config import settings
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,9 +16,10 @@ engine = create_async_engine(
     echo=False,
     future=True,
     pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
-    pool_recycle=3600,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
 )
 
 # Создаем сессию
@@ -58,6 +60,46 @@ async def check_database_connection():
         logger.error(f"Database connection check failed: {e}")
         return False
 
+async def prewarm_pool(n: int) -> int:
+    """
+    Открывает n соединений заранее (подключение + интроспекция типов asyncpg),
+    чтобы первые запросы после деплоя не платили за них. Возвращает число открытых.
+    """
+    n = min(n, settings.DB_POOL_SIZE)
+    if n <= 0:
+        return 0
+
+    async def _one():
+        conn = await engine.connect()
+        await conn.execute(text("SELECT 1"))
+        return conn
+
+    results = await asyncio.gather(*(_one() for _ in range(n)), return_exceptions=True)
+    opened = 0
+    for r in results:
+        if isinstance(r, BaseException):
+            logger.warning(f"Pool prewarm: {r}")
+            continue
+        await r.close()  # вернётся в пул открытым
+        opened += 1
+    return opened
+
+
+def pool_status() -> dict:
+    """Состояние пула без обращения к БД."""
+    pool = engine.pool
+    checked_in, checked_out = pool.checkedin(), pool.checkedout()
+    return {
+        "size": pool.size(),
+        "open": checked_in + checked_out,
+        "checked_in": checked_in,
+        "checked_out": checked_out,
+        # QueuePool считает неоткрытые слоты отрицательным overflow
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+    }
+
+
 async def close_db_connections():
     """Закрытие всех соединений с базой данных"""
     try:
@@ -1,40 +1,88 @@
 import uuid
 from typing import Optional, Iterable
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from .cache import TTLCache
+from .config import settings
 from .db import get_db
-from .models import User, ProjectMember
+from .models import User
+from .permissions import get_permissions, remember_version
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
+# id -> значения колонок активного пользователя. В кэше только активные:
+# деактивация / смена прав должны вызывать invalidate_user(). Для других воркеров
+# такие изменения должны ещё и поднимать users.permissions_version
+# (invalidate_permissions) — кэш-хит сверяется с версией в БД.
+_USER_COLUMNS = tuple(c.key for c in User.__table__.columns)
+_user_cache: TTLCache[dict] = TTLCache(maxsize=settings.USER_CACHE_MAX_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+
+
+def invalidate_user(user_id: uuid.UUID) -> None:
+    """Сбросить закэшированного пользователя (после изменения его полей)."""
+    _user_cache.pop(user_id)
+
+
+async def get_current_user(
+    request: Request,
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db),
+) -> User:
+    # мемо на время запроса: несколько зависимостей — один разбор токена
+    memo = getattr(request.state, "current_user", None)
+    if memo is not None:
+        return memo
+
     from .security import decode_access_token
     uid = decode_access_token(token)
     if not uid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    row = await db.execute(select(User).where(User.id == uid))
-    user = row.scalar_one_or_none()
-    if not user or not user.is_active:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User inactive or not found")
+
+    values = _user_cache.get(uid)
+    if values is not None:
+        version = (
+            await db.execute(select(User.permissions_version).where(User.id == uid))
+        ).scalar_one_or_none()
+        if version != values["permissions_version"]:
+            # поменяли в другом воркере (или пользователя удалили) — перечитываем
+            _user_cache.pop(uid)
+            values = None
+    if values is None:
+        row = (await db.execute(select(*User.__table__.columns).where(User.id == uid))).mappings().one_or_none()
+        if not row or not row["is_active"]:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User inactive or not found")
+        values = {k: row[k] for k in _USER_COLUMNS}
+        _user_cache.set(uid, values)
+    remember_version(db, uid, values["permissions_version"])
+
+    # свой (не привязанный к сессии) экземпляр на запрос: общий объект между
+    # запросами никто не должен менять
+    user = User(**values)
+    request.state.current_user = user
     return user
 
 async def require_project_role(project_id: uuid.UUID, user: User, db: AsyncSession, roles: Iterable[str]):
     if user.is_superuser:
         return
-    q = await db.execute(
-        select(ProjectMember.role).where(
-            ProjectMember.project_id == project_id,
-            ProjectMember.user_id == user.id
-        )
-    )
-    role = q.scalar_one_or_none()
+    role = (await get_permissions(db, user.id)).project_role(project_id)
     if not role or role not in roles:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient role")
 
+async def require_project_roles(project_ids: Iterable[uuid.UUID], user: User, db: AsyncSession, roles: Iterable[str]):
+    """require_project_role сразу для набора проектов — по одному снимку прав."""
+    if user.is_superuser:
+        return
+    perms = await get_permissions(db, user.id)
+    roles = tuple(roles)
+    for project_id in set(project_ids):
+        role = perms.project_role(project_id)
+        if not role or role not in roles:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient role")
+
 async def get_async_session():
     async for s in get_db():
         yield s
@@ -42,13 +90,12 @@ async def get_async_session():
 async def get_project_role(project_id: uuid.UUID, user: User, db: AsyncSession) -> str:
     if user.is_superuser:
         return "admin"
-    q = await db.execute(
-        select(ProjectMember.role).where(
-            ProjectMember.project_id == project_id,
-            ProjectMember.user_id == user.id
-        )
-    )
-    role = q.scalar_one_or_none()
+    role = (await get_permissions(db, user.id)).project_role(project_id)
     if not role:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No access to project")
     return role
+
+async def require_superuser(user: User = Depends(get_current_user)) -> User:
+    if not user.is_superuser:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Superuser only")
+    return user
@@ -0,0 +1,45 @@
+"""
+Логирование горячих путей: ленивое форматирование, DEBUG-гейт и сэмплирование.
+
+Частые события (проверки доступа на каждый запрос) пишутся одной строкой
+key=value на DEBUG и только для доли LOG_SAMPLE_RATE запросов: при LOG_LEVEL=INFO
+они не стоят ничего, кроме isEnabledFor. Отказы в доступе редки и полезны —
+они пишутся всегда, на INFO.
+
+Поля события дублируются в extra={"event": ...} — для JSON-форматтеров.
+"""
+import logging
+import random
+from typing import Optional
+
+from .config import settings
+
+
+def sampled(logger: logging.Logger, level: int = logging.DEBUG, rate: Optional[float] = None) -> bool:
+    """Писать ли частое событие: уровень включён и запрос попал в выборку."""
+    if not logger.isEnabledFor(level):
+        return False
+    rate = settings.LOG_SAMPLE_RATE if rate is None else rate
+    return rate >= 1 or random.random() < rate
+
+
+def log_access(logger: logging.Logger, action: str, user, decision: str, role: Optional[str] = None, **fields) -> None:
+    """Одно событие о решении по доступу: allow — DEBUG с сэмплированием, deny — всегда INFO."""
+    if decision == "deny":
+        level = logging.INFO
+        if not logger.isEnabledFor(level):
+            return
+    else:
+        level = logging.DEBUG
+        if not sampled(logger, level):
+            return
+    event = {
+        "event": "access",
+        "action": action,
+        "decision": decision,
+        "user_id": str(user.id),
+        "superuser": bool(user.is_superuser),
+        "role": role,
+        **fields,
+    }
+    logger.log(level, " ".join(f"{k}=%s" for k in event), *event.values(), extra={"event": event})
@@ -1,5 +1,7 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
@@ -16,7 +18,8 @@ from .routers import (
     access,
     analytics,
     doctor_parser,
-    tz
+    tz,
+    admin
 )
 
 # Настройка логирования
@@ -27,44 +30,18 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Функция для применения миграций
-def run_migrations():
-    """Автоматически применяет все неприменённые миграции"""
+async def run_migrations():
+    """Применяет неприменённые миграции (in-process, под advisory lock)"""
 
     if not settings.AUTO_MIGRATE:
         logger.info("ℹ️ Автоматические миграции отключены (AUTO_MIGRATE=false)")
         return True
 
     try:
-        import subprocess
-        import os
-
-        logger.info("🔄 Применение миграций через subprocess...")
-
-        # Применяем миграции через subprocess с таймаутом
-        env = os.environ.copy()
-        env['ALEMBIC_DATABASE_URL'] = settings.ALEMBIC_DATABASE_URL
-
-        result = subprocess.run(
-            ['alembic', 'upgrade', 'head'],
-            capture_output=True,
-            text=True,
-            timeout=60,  # Таймаут 60 секунд
-            env=env,
-            cwd='/app'
-        )
-
-        if result.returncode == 0:
-            logger.info("✅ Миграции успешно применены")
-            if result.stdout:
-                logger.info(f"📋 Вывод: {result.stdout}")
-            return True
-        else:
-            logger.error(f"❌ Ошибка применения миграций: {result.stderr}")
-            return False
-
-    except subprocess.TimeoutExpired:
-        logger.error("⏰ Миграции превысили лимит времени (60 сек)")
-        return False
+        from .migrations import ensure_schema_current
+        # alembic синхронный — уводим из event loop
+        await asyncio.to_thread(ensure_schema_current)
+        return True
 
     except Exception as e:
         logger.error(f"❌ Ошибка при применении миграций: {e}")
@@ -83,7 +60,7 @@ async def lifespan(app: FastAPI):
 
     # Применяем миграции перед инициализацией БД
     try:
-        migration_success = run_migrations()
+        migration_success = await run_migrations()
         if not migration_success:
             logger.warning("⚠️ Миграции не были применены, но продолжаем запуск")
     except Exception as e:
@@ -99,16 +76,29 @@ async def lifespan(app: FastAPI):
         logger.error(f"💥 Database initialization failed: {e}")
         raise
 
+    # Прогрев пула соединений
+    try:
+        from .db import prewarm_pool
+        opened = await prewarm_pool(settings.DB_POOL_PREWARM)
+        logger.info(f"✅ Connection pool prewarmed: {opened} connections")
+    except Exception as e:
+        logger.warning(f"⚠️ Connection pool prewarm failed: {e}")
+
+    app.state.ready = True
     logger.info("✅ Application startup completed")
 
     yield
 
     # Shutdown
+    app.state.ready = False
     logger.info("🛑 Shutting down KeywordHub API...")
     try:
         from .db import close_db_connections
         await close_db_connections()
         logger.info("✅ Database connections closed")
+
+        from .security import shutdown_hash_executor
+        shutdown_hash_executor()
     except Exception as e:
         logger.error(f"⚠️ Error during shutdown: {e}")
 
@@ -127,8 +117,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Next-Cursor", "Server-Timing"],
 )
 
+# Метрики Prometheus (внешний слой: видит итоговый статус ответа)
+from .db import engine
+from .metrics import MetricsMiddleware, instrument_engine
+instrument_engine(engine)
+app.add_middleware(MetricsMiddleware)
+
 # Подключение роутеров
 app.include_router(auth.router)
 app.include_router(projects.router)
@@ -141,6 +138,7 @@ app.include_router(access.router)
 app.include_router(analytics.router)
 app.include_router(doctor_parser.router)
 app.include_router(tz.router)
+app.include_router(admin.router)
 
 @app.get("/")
 async def root():
@@ -180,6 +178,23 @@ async def health():
             "error": str(e)
         }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики в формате Prometheus"""
+    from .metrics import render_metrics
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/ready")
+async def ready():
+    """Readiness-проба: старт завершён; состояние пула — без запроса к БД"""
+    from .db import pool_status
+    is_ready = getattr(app.state, "ready", False)
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"status": "ready" if is_ready else "starting", "pool": pool_status()},
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
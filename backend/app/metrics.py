@@ -0,0 +1,251 @@
+"""
+Prometheus-метрики: HTTP (по шаблону роута), пул БД, SQL по роутам, фоновые задачи.
+
+Сбор — чистый ASGI middleware + хуки SQLAlchemy before/after_cursor_execute.
+Статистика SQL текущего запроса лежит в contextvar (RequestStats) и доступна
+другим частям приложения через current_request_stats().
+
+Тот же RequestStats даёт заголовок Server-Timing (SERVER_TIMING_ENABLED) и,
+при SQL_DEBUG, предупреждение о повторяющихся в одном запросе выражениях (N+1).
+
+Для нескольких воркеров uvicorn задайте PROMETHEUS_MULTIPROC_DIR —
+/metrics соберёт данные всех процессов.
+"""
+import logging
+import os
+import re
+import time
+from collections import Counter as _Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from sqlalchemy import event
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_MULTIPROC = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# ---------------- HTTP ----------------
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP запросы", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Длительность HTTP запроса", ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+HTTP_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Запросы в обработке", ["method"],
+    multiprocess_mode="livesum",
+)
+
+# ---------------- SQL ----------------
+DB_STATEMENTS = Counter(
+    "db_statements_total", "SQL-выражения, выполненные при обработке роута", ["route"]
+)
+DB_TIME = Counter(
+    "db_statement_seconds_total", "Суммарное время SQL при обработке роута", ["route"]
+)
+DB_STATEMENTS_PER_REQUEST = Histogram(
+    "db_statements_per_request", "Число SQL-выражений на запрос", ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100, 250, 1000),
+)
+
+# ---------------- Пул соединений ----------------
+DB_POOL = Gauge(
+    "db_pool_connections", "Соединения пула БД", ["state"],
+    multiprocess_mode="livesum",
+)
+
+# ---------------- Фоновые/тяжёлые операции ----------------
+IMPORTS = Counter("keywordhub_imports_total", "Успешные импорты", ["kind"])
+IMPORTED_ROWS = Counter("keywordhub_imported_rows_total", "Строки, обработанные импортом", ["kind"])
+EXPORTS = Counter("keywordhub_exports_total", "Экспорты", ["kind"])
+PARSER_TASKS = Counter("keywordhub_parser_tasks_total", "Задачи парсера врачей", ["status"])
+
+
+# ---------------- Контекст запроса ----------------
+@dataclass
+class RequestStats:
+    statements: int = 0
+    db_seconds: float = 0.0
+    # форма выражения -> сколько раз выполнялось (только при SQL_DEBUG)
+    shapes: Optional[_Counter] = field(default=None)
+
+
+# приведение типа — одно слово либо один из многословных типов, иначе съедается SQL после каста;
+# модификатор типа (VARCHAR(255), NUMERIC(10, 2)) и [] — часть каста
+_PARAM_RE = re.compile(
+    r"(?:\$\d+|%\(\w+\)s|\?)"
+    r"(?:::(?:double precision|character varying|timestamp with(?:out)? time zone|\w+)"
+    r"(?:\([^)]*\))?(?:\[\])?)?",
+    re.IGNORECASE,
+)
+_PARAM_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """SQL без значений параметров и длины IN-списков — для поиска повторов."""
+    s = _PARAM_RE.sub("?", statement)
+    s = _PARAM_LIST_RE.sub("(?)", s)
+    return _SPACE_RE.sub(" ", s).strip()
+
+
+def _server_timing(stats: RequestStats, elapsed: float) -> bytes:
+    return (
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.statements} queries", '
+        f"app;dur={elapsed * 1000:.1f}"
+    ).encode("latin-1")
+
+
+def _warn_repeated(stats: RequestStats, method: str, route: str) -> None:
+    threshold = settings.SQL_REPEAT_THRESHOLD
+    for shape, count in stats.shapes.most_common():
+        if count <= threshold:
+            break
+        logger.warning(
+            "Possible N+1: %s %s ran the same statement %d times: %.300s",
+            method, route, count, shape,
+        )
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    # несматченные пути не пишем как есть — иначе взрыв кардинальности
+    return path or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """
+    Метрики запроса фиксируются на последнем http.response.body, а не после
+    await self.app(...): Starlette выполняет BackgroundTasks внутри этого await,
+    и иначе фоновая работа (парсер врачей) попадала бы в латентность, in-flight
+    и SQL-статистику роута. finally — только запасной путь для ответов, которые
+    до последнего сообщения не дошли (исключение, обрыв соединения).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        stats = RequestStats(shapes=_Counter() if settings.SQL_DEBUG else None)
+        token = _request_stats.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+        in_progress = HTTP_IN_PROGRESS.labels(method)
+        finished = False
+
+        def finish() -> None:
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            elapsed = time.perf_counter() - start
+            in_progress.dec()
+            # хуки SQL больше не пишут в статистику этого запроса
+            _request_stats.set(None)
+
+            route = _route_template(scope)
+            HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+            HTTP_LATENCY.labels(method, route).observe(elapsed)
+            if stats.statements:
+                DB_STATEMENTS.labels(route).inc(stats.statements)
+                DB_TIME.labels(route).inc(stats.db_seconds)
+            DB_STATEMENTS_PER_REQUEST.labels(route).observe(stats.statements)
+            if stats.shapes:
+                _warn_repeated(stats, method, route)
+            if _MULTIPROC:
+                # в multiprocess-режиме каждый воркер публикует свой пул сам
+                _update_pool_gauges()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.SERVER_TIMING_ENABLED:
+                    # для стриминговых ответов — SQL, выполненный до отправки заголовков
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(stats, time.perf_counter() - start)))
+                    message = {**message, "headers": headers}
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        in_progress.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
+            _request_stats.reset(token)
+
+
+# ---------------- Хуки SQLAlchemy ----------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+        if stats.shapes is not None:
+            stats.shapes[statement_shape(statement)] += 1
+
+
+def instrument_engine(engine) -> None:
+    """Вешает хуки на sync-движок (для AsyncEngine — engine.sync_engine)."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _update_pool_gauges() -> None:
+    from .db import pool_status
+
+    status = pool_status()
+    DB_POOL.labels("checked_in").set(status["checked_in"])
+    DB_POOL.labels("checked_out").set(status["checked_out"])
+    DB_POOL.labels("overflow").set(status["overflow"])
+    DB_POOL.labels("size").set(status["size"])
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Тело и content-type для /metrics."""
+    _update_pool_gauges()
+    if _MULTIPROC:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,77 @@
+"""
+Проверка и применение миграций при старте приложения — без subprocess.
+
+Сравниваем alembic_version в БД с head'ами скриптов прямо в процессе.
+Если схема актуальна — ничего не делаем (дешёвый SELECT). Иначе берём
+pg_advisory_lock, чтобы мигрировала только одна реплика/воркер, перепроверяем
+и запускаем alembic upgrade head в том же соединении.
+"""
+import logging
+import os
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, pool, text
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Ключ advisory lock для миграций (произвольная константа)
+MIGRATION_LOCK_ID = 72_310_028
+
+
+def _alembic_config() -> Config:
+    cfg = Config(str(BACKEND_DIR / "alembic.ini"))
+    cfg.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    cfg.attributes["configure_logger"] = False
+    return cfg
+
+
+def _is_current(conn, heads: set[str]) -> bool:
+    return set(MigrationContext.configure(conn).get_current_heads()) == heads
+
+
+def ensure_schema_current() -> bool:
+    """
+    Доводит схему до head. Возвращает True, если миграции применялись,
+    False — если схема уже была актуальна.
+    """
+    cfg = _alembic_config()
+    heads = set(ScriptDirectory.from_config(cfg).get_heads())
+
+    url = os.getenv("ALEMBIC_DATABASE_URL") or settings.ALEMBIC_DATABASE_URL
+    engine = create_engine(url, poolclass=pool.NullPool, connect_args={"application_name": "alembic_migrations"})
+    try:
+        with engine.connect() as conn:
+            if _is_current(conn, heads):
+                logger.info("✅ Схема БД актуальна (%s), миграции не нужны", ", ".join(sorted(heads)))
+                return False
+
+            logger.info("🔒 Ожидание блокировки миграций...")
+            conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": MIGRATION_LOCK_ID})
+            conn.commit()
+            try:
+                # пока ждали, миграции мог применить другой воркер
+                if _is_current(conn, heads):
+                    conn.commit()
+                    logger.info("✅ Миграции уже применены другим процессом")
+                    return False
+                conn.commit()
+
+                logger.info("🔄 Применение миграций до %s...", ", ".join(sorted(heads)))
+                cfg.attributes["connection"] = conn
+                command.upgrade(cfg, "head")
+                conn.commit()
+                logger.info("✅ Миграции успешно применены")
+                return True
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": MIGRATION_LOCK_ID})
+                conn.commit()
+    finally:
+        engine.dispose()
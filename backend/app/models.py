@@ -19,10 +19,11 @@ from sqlalchemy import (
     Date,
     DateTime,
     JSON,
-    Index
+    Index,
+    Computed
 )
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy.dialects.postgresql import JSONB, UUID, ARRAY
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, deferred
+from sqlalchemy.dialects.postgresql import JSONB, UUID, ARRAY, TSVECTOR
 from .db import Base
 
 
@@ -45,6 +46,8 @@ class User(Base):
     is_superuser: Mapped[bool] = mapped_column(default=False)
     created_at: Mapped[datetime] = mapped_column(default=func.now())
     can_view_all_content: Mapped[bool] = mapped_column(Boolean, default=False)
+    # растёт при каждом изменении прав — по нему воркеры сверяют кэш (app/permissions.py)
+    permissions_version: Mapped[int] = mapped_column(Integer, default=0, server_default=text("0"))
 
 
 class Project(Base):
@@ -156,11 +159,17 @@ class ClusterRegistry(Base):
     page_type: Mapped[str | None] = mapped_column(String(120), nullable=True)   # Тип страницы
 
     # Статусы/метрики
+    # has_core / is_published / demand — производные от queries, их ведут триггеры
+    # (миграция 028_cluster_registry_derived), руками не пишем
     has_core: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=text("false"))   # Ядро
     has_brief: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=text("false"))  # ТЗ
     is_published: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=text("false")) # Размещено
     demand: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))          # Спрос (WS)
 
+    # Счётчики для has_core / is_published
+    queries_count: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    pages_count: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+
     created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=text("now()"))
     updated_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=text("now()"))
 
@@ -211,12 +220,44 @@ class ContentPlanItem(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
+    # Поиск (миграция 033): генерируются в БД, по умолчанию не загружаются
+    search_tsv = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('russian', coalesce(topic, '')), 'A') || "
+        "setweight(to_tsvector('russian', coalesce(section, '') || ' ' || coalesce(direction, '')), 'B') || "
+        "setweight(to_tsvector('russian', coalesce(meta_seo, '') || ' ' || coalesce(comment, '')), 'C') || "
+        "setweight(to_tsvector('simple', coalesce(author, '')), 'D')",
+        persisted=True,
+    )))
+    search_text = deferred(Column(Text, Computed(
+        "coalesce(topic, '') || E'\\n' || coalesce(section, '') || E'\\n' || "
+        "coalesce(direction, '') || E'\\n' || coalesce(comment, '') || E'\\n' || "
+        "coalesce(meta_seo, '') || E'\\n' || coalesce(author, '')",
+        persisted=True,
+    )))
+
+    # Ключ дедупликации импорта (миграция 034); считается и в app.routers.content_plan._dedup_key
+    dedup_key = deferred(Column(String(32), Computed(
+        "md5(coalesce(project_id::text, '') || chr(31) || coalesce(topic, '') || chr(31) || "
+        "coalesce(period, '') || chr(31) || coalesce(direction, '') || chr(31) || coalesce(section, ''))",
+        persisted=True,
+    )))
+
     technical_specification = relationship(
         "TechnicalSpecification",
         back_populates="content_plan_item",
         uselist=False  # Один к одному
     )
 
+    # keyset-листание GET /content-plan по (created_at, id) — миграция 032
+    __table_args__ = (
+        Index("ix_content_plan_items_project_created", "project_id", "created_at", "id"),
+        Index("ix_content_plan_items_created", "created_at", "id"),
+        Index("ix_content_plan_items_search_tsv", "search_tsv", postgresql_using="gin"),
+        Index("ix_content_plan_items_search_trgm", "search_text", postgresql_using="gin",
+              postgresql_ops={"search_text": "gin_trgm_ops"}),
+        Index("ix_content_plan_items_dedup_key", "dedup_key"),
+    )
+
 
 class PageAccess(Base):
     __tablename__ = "page_access"
@@ -241,6 +282,9 @@ class PageRole(Base):
 
     __table_args__ = (
         UniqueConstraint("user_id", "page", "project_id", name="uq_user_page_project"),
+        # роль на всю страницу (project_id IS NULL) — одна на пользователя
+        Index("uq_page_roles_user_page_global", "user_id", "page", unique=True,
+              postgresql_where=text("project_id IS NULL")),
     )
 
 
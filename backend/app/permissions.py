@@ -0,0 +1,131 @@
+"""
+Снимок прав пользователя: страницы с доступом, роли на страницах и роли в проектах.
+
+Загружается одним обращением к БД и кэшируется на процесс. Чтобы снимок не
+устаревал в других воркерах/репликах, у пользователя есть счётчик
+users.permissions_version: любая ручка, меняющая PageAccess / PageRole /
+ProjectMember, в той же транзакции (до commit) вызывает
+invalidate_permissions(db, user_id) или invalidate_project_permissions(db, project_id).
+Кэш-хит сверяется с версией в БД — это одно лёгкое чтение по PK вместо
+трёх запросов за правами. Сверенный снимок запоминается в db.info на время
+сессии (сессия = запрос, см. get_db), так что за запрос версия читается один раз,
+сколько бы проверок ни вызывало get_permissions. get_current_user по той же
+версии сбрасывает закэшированные поля пользователя (can_view_all_content и т. п.)
+и передаёт прочитанное значение сюда через remember_version — второго чтения нет.
+"""
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache import TTLCache
+from .config import settings
+from .models import PageAccess, PageRole, ProjectMember, User
+
+
+@dataclass(frozen=True)
+class PermissionSnapshot:
+    user_id: uuid.UUID
+    version: int
+    pages: FrozenSet[str] = frozenset()
+    page_roles: Dict[str, str] = field(default_factory=dict)
+    project_roles: Dict[uuid.UUID, str] = field(default_factory=dict)
+
+    def has_page(self, page: str) -> bool:
+        return page in self.pages
+
+    def project_role(self, project_id: uuid.UUID) -> str | None:
+        return self.project_roles.get(project_id)
+
+
+_cache: TTLCache[PermissionSnapshot] = TTLCache(
+    maxsize=settings.PERMISSION_CACHE_MAX_SIZE,
+    ttl=settings.PERMISSION_CACHE_TTL_SECONDS,
+)
+
+# ключи в AsyncSession.info: user_id -> снимок, уже сверенный в этой сессии;
+# user_id -> permissions_version, уже прочитанная в этой сессии
+_SESSION_KEY = "permission_snapshots"
+_VERSION_KEY = "permissions_versions"
+
+
+def _forget(db: AsyncSession, user_id: uuid.UUID) -> None:
+    _cache.pop(user_id)
+    db.info.get(_SESSION_KEY, {}).pop(user_id, None)
+    db.info.get(_VERSION_KEY, {}).pop(user_id, None)
+
+
+def remember_version(db: AsyncSession, user_id: uuid.UUID, version: int) -> None:
+    """Версия уже прочитана в этой сессии (get_current_user) — get_permissions её переиспользует."""
+    db.info.setdefault(_VERSION_KEY, {})[user_id] = version
+
+
+async def invalidate_permissions(db: AsyncSession, user_id: uuid.UUID) -> None:
+    """Права пользователя изменились — вызывать до commit, в той же транзакции."""
+    await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(permissions_version=User.permissions_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    _forget(db, user_id)
+
+
+async def invalidate_project_permissions(db: AsyncSession, project_id: uuid.UUID) -> None:
+    """Для всех участников проекта (например, перед удалением проекта)."""
+    members = select(ProjectMember.user_id).where(ProjectMember.project_id == project_id)
+    user_ids = (
+        await db.execute(
+            update(User)
+            .where(User.id.in_(members))
+            .values(permissions_version=User.permissions_version + 1)
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
+        )
+    ).scalars().all()
+    for user_id in user_ids:
+        _forget(db, user_id)
+
+
+async def _load(db: AsyncSession, user_id: uuid.UUID, version: int) -> PermissionSnapshot:
+    pages = (await db.execute(select(PageAccess.page).where(PageAccess.user_id == user_id))).scalars().all()
+    page_roles = (
+        await db.execute(
+            select(PageRole.page, PageRole.role).where(PageRole.user_id == user_id, PageRole.project_id.is_(None))
+        )
+    ).all()
+    members = (
+        await db.execute(
+            select(ProjectMember.project_id, ProjectMember.role).where(ProjectMember.user_id == user_id)
+        )
+    ).all()
+    return PermissionSnapshot(
+        user_id=user_id,
+        version=version,
+        pages=frozenset(pages),
+        page_roles={page: role for page, role in page_roles},
+        project_roles={pid: role for pid, role in members},
+    )
+
+
+async def get_permissions(db: AsyncSession, user_id: uuid.UUID) -> PermissionSnapshot:
+    checked = db.info.setdefault(_SESSION_KEY, {})
+    snap = checked.get(user_id)
+    if snap is not None:
+        return snap
+
+    # версию читаем до данных: если права поменяются между запросами, снимок
+    # окажется новее своей версии и просто перечитается в следующий раз
+    version = db.info.get(_VERSION_KEY, {}).get(user_id)
+    if version is None:
+        version = (
+            await db.execute(select(User.permissions_version).where(User.id == user_id))
+        ).scalar_one_or_none() or 0
+    snap = _cache.get(user_id)
+    if snap is None or snap.version != version:
+        snap = await _load(db, user_id, version)
+        _cache.set(user_id, snap)
+    checked[user_id] = snap
+    return snap
@@ -1,14 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, insert, delete, exists, update, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError
 from uuid import UUID
 from typing import List, Set, Optional
 from pydantic import BaseModel, Field
 
 from app.db import get_db
-from app.models import PageAccess, User
+from app.models import PageAccess, PageRole, User
 from ..deps import get_current_user
+from ..permissions import get_permissions, invalidate_permissions
 from ..schemas import UpdateUserAccessIn
 
 router = APIRouter(prefix="/access", tags=["Access Control"])
@@ -29,9 +31,6 @@ class UpdateUserPagesWithRoles(BaseModel):
     pages_revoke: Optional[List[str]] = []
     page_roles: Optional[List[PageRoleIn]] = []
 
-# Временное хранилище ролей (в продакшене лучше использовать отдельную таблицу)
-user_page_roles = {}  # user_id -> {page: role}
-
 
 # ==== утилиты ====
 
@@ -51,20 +50,13 @@ async def require_page_access(db: AsyncSession, user, page: str, required_role:
     if page not in PAGES:
         raise HTTPException(400, f"Неизвестная страница: {page}")
 
-    # Проверяем базовый доступ к странице
-    has_access = (
-        await db.execute(
-            select(PageAccess)
-            .where(PageAccess.user_id == user.id, PageAccess.page == page)
-        )
-    ).scalar_one_or_none()
-
-    if not has_access:
+    # Проверяем базовый доступ к странице (снимок прав из кэша)
+    perms = await get_permissions(db, user.id)
+    if not perms.has_page(page):
         raise HTTPException(403, f"Нет доступа к странице {page}")
 
     # Получаем роль пользователя
-    user_roles = user_page_roles.get(str(user.id), {})
-    page_role = user_roles.get(page, "viewer")
+    page_role = perms.page_roles.get(page, "viewer")
 
     # Проверяем права согласно новой логике
     if page == "content_plan":
@@ -95,14 +87,54 @@ async def get_user_pages(db: AsyncSession, user_id: UUID) -> Set[str]:
     return set(pages)
 
 
-def get_user_page_roles(user_id: UUID) -> dict:
-    """Получает роли пользователя для страниц."""
-    return user_page_roles.get(str(user_id), {})
+async def get_user_page_roles(db: AsyncSession, user_id: UUID) -> dict:
+    """Получает роли пользователя для страниц (копия — её можно менять)."""
+    return dict((await get_permissions(db, user_id)).page_roles)
 
 
-def set_user_page_roles(user_id: UUID, page_roles: dict):
-    """Устанавливает роли пользователя для страниц."""
-    user_page_roles[str(user_id)] = page_roles
+async def get_users_page_roles(db: AsyncSession, user_ids: List[UUID]) -> dict:
+    """Роли на страницах для списка пользователей одним запросом: {user_id: {page: role}}."""
+    result: dict = {uid: {} for uid in user_ids}
+    if not user_ids:
+        return result
+    rows = (
+        await db.execute(
+            select(PageRole.user_id, PageRole.page, PageRole.role).where(
+                PageRole.user_id.in_(user_ids), PageRole.project_id.is_(None)
+            )
+        )
+    ).all()
+    for uid, page, role in rows:
+        result[uid][page] = role
+    return result
+
+
+async def set_user_page_roles(db: AsyncSession, user_id: UUID, page_roles: dict):
+    """
+    Ставит роли только на переданных страницах (upsert, без commit); роли на
+    остальных страницах не трогает. Вызывающий до commit делает
+    invalidate_permissions(db, user_id).
+    """
+    if not page_roles:
+        return
+    stmt = pg_insert(PageRole).values(
+        [{"user_id": user_id, "page": page, "role": role} for page, role in page_roles.items()]
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[PageRole.user_id, PageRole.page],
+            index_where=PageRole.project_id.is_(None),
+            set_={"role": stmt.excluded.role, "updated_at": func.now()},
+        )
+    )
+
+
+async def delete_user_page_roles(db: AsyncSession, user_id: UUID, pages: Optional[List[str]] = None):
+    """Удаляет роли на страницах pages (None — на всех), без commit."""
+    stmt = delete(PageRole).where(PageRole.user_id == user_id, PageRole.project_id.is_(None))
+    if pages is not None:
+        stmt = stmt.where(PageRole.page.in_(pages))
+    await db.execute(stmt)
 
 
 def check_role_permissions(page_role: str, action: str, is_owner: bool = False) -> bool:
@@ -175,7 +207,7 @@ async def list_page_access(
     await ensure_user_exists(db, user_id)
 
     pages = await get_user_pages(db, user_id)
-    page_roles = get_user_page_roles(user_id)
+    page_roles = await get_user_page_roles(db, user_id)
 
     return {
         "user_id": user_id,
@@ -199,7 +231,7 @@ async def get_user_page_roles_endpoint(
 
     await ensure_user_exists(db, user_id)
 
-    page_roles = get_user_page_roles(user_id)
+    page_roles = await get_user_page_roles(db, user_id)
     return [
         PageRoleOut(page=page, role=role)
         for page, role in page_roles.items()
@@ -217,7 +249,7 @@ async def grant_page_access(
     """Предоставить доступ пользователю к странице с ролью."""
     if not getattr(current, "is_superuser", False):
         # Проверяем, что текущий пользователь имеет права admin для данной страницы
-        user_roles = get_user_page_roles(current.id)
+        user_roles = await get_user_page_roles(db, current.id)
         current_role = user_roles.get(page, "viewer")
         if current_role != "admin":
             raise HTTPException(403, "Нужны права администратора для управления ролями")
@@ -243,19 +275,18 @@ async def grant_page_access(
             await db.execute(insert(PageAccess).values(user_id=user_id, page=page))
 
         # Устанавливаем роль
-        user_roles = get_user_page_roles(user_id)
-        user_roles[page] = role
-        set_user_page_roles(user_id, user_roles)
+        await set_user_page_roles(db, user_id, {page: role})
 
+        await invalidate_permissions(db, user_id)
         await db.commit()
         return {"ok": True, "message": f"Доступ предоставлен с ролью {role}"}
 
     except IntegrityError:
         await db.rollback()
         # Если доступ уже есть, просто обновляем роль
-        user_roles = get_user_page_roles(user_id)
-        user_roles[page] = role
-        set_user_page_roles(user_id, user_roles)
+        await set_user_page_roles(db, user_id, {page: role})
+        await invalidate_permissions(db, user_id)
+        await db.commit()
         return {"ok": True, "message": f"Роль обновлена на {role}"}
     except Exception as e:
         await db.rollback()
@@ -272,7 +303,7 @@ async def revoke_page_access(
     """Отозвать доступ пользователя к странице."""
     if not getattr(current, "is_superuser", False):
         # Проверяем права admin
-        user_roles = get_user_page_roles(current.id)
+        user_roles = await get_user_page_roles(db, current.id)
         current_role = user_roles.get(page, "viewer")
         if current_role != "admin":
             raise HTTPException(403, "Нужны права администратора для управления ролями")
@@ -291,10 +322,9 @@ async def revoke_page_access(
         )
 
         # Удаляем роль
-        user_roles = get_user_page_roles(user_id)
-        user_roles.pop(page, None)
-        set_user_page_roles(user_id, user_roles)
+        await delete_user_page_roles(db, user_id, [page])
 
+        await invalidate_permissions(db, user_id)
         await db.commit()
 
         deleted = res.rowcount > 0
@@ -317,7 +347,7 @@ async def update_user_pages(
     """Массовое обновление доступа пользователя к страницам с ролями."""
     if not getattr(current, "is_superuser", False):
         # Проверяем права admin для всех затрагиваемых страниц
-        user_roles = get_user_page_roles(current.id)
+        user_roles = await get_user_page_roles(db, current.id)
         all_pages = set()
         
         if payload.pages_grant:
@@ -376,19 +406,20 @@ async def update_user_pages(
 
         # Обновляем роли для страниц
         if payload.page_roles:
-            user_roles = get_user_page_roles(user_id)
-            for role_data in payload.page_roles:
-                if role_data.page in current_pages:
-                    user_roles[role_data.page] = role_data.role
-            set_user_page_roles(user_id, user_roles)
+            await set_user_page_roles(db, user_id, {
+                role_data.page: role_data.role
+                for role_data in payload.page_roles
+                if role_data.page in current_pages
+            })
 
+        await invalidate_permissions(db, user_id)
         await db.commit()
         return {
             "ok": True,
             "granted": granted,
             "revoked": revoked,
             "current_pages": list(current_pages),
-            "page_roles": get_user_page_roles(user_id),
+            "page_roles": await get_user_page_roles(db, user_id),
             "message": f"Предоставлено: {granted}, Отозвано: {revoked}"
         }
 
@@ -441,7 +472,7 @@ async def sync_user_pages(
         )
 
         # Очищаем роли
-        set_user_page_roles(user_id, {})
+        await delete_user_page_roles(db, user_id)
 
         # Добавляем новые доступы
         granted = 0
@@ -451,6 +482,7 @@ async def sync_user_pages(
             )
             granted += 1
 
+        await invalidate_permissions(db, user_id)
         await db.commit()
         return {
             "ok": True,
@@ -476,7 +508,7 @@ async def get_user_permissions(
     if page not in PAGES:
         raise HTTPException(400, f"Неизвестная страница: {page}")
     
-    user_roles = get_user_page_roles(current.id)
+    user_roles = await get_user_page_roles(db, current.id)
     page_role = user_roles.get(page, "viewer")
     
     return {
@@ -0,0 +1,179 @@
+# backend/routers/admin.py
+"""
+Диагностика БД для суперпользователей: топ выражений из pg_stat_statements,
+сброс статистики и EXPLAIN (ANALYZE, BUFFERS) для разрешённого набора
+запросов горячих путей.
+
+pg_stat_statements должен быть в shared_preload_libraries (docker-compose.prod.yml)
+и создан как расширение (миграция 031). Если его нет — ручки отвечают 503.
+"""
+import logging
+import uuid
+from typing import Callable, Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query as Q
+from pydantic import BaseModel, Field
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from ..db import get_db
+from ..deps import require_superuser
+from .analytics import PERIODS_SQL
+from .cluster_registry import registry_conditions, registry_page_stmt
+from .content_plan import filter_conditions, list_page_stmt as content_plan_page_stmt
+from .queries import queries_count_stmt, queries_list_stmt, queries_statistics_stmt
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_superuser)])
+
+# order_by -> колонка pg_stat_statements (только из этого списка попадает в SQL)
+TOP_QUERY_ORDER = {
+    "total": "total_exec_time",
+    "mean": "mean_exec_time",
+    "calls": "calls",
+    "rows": "rows",
+}
+
+EXPLAIN_TIMEOUT_MS = 30_000
+
+class ExplainIn(BaseModel):
+    project_id: uuid.UUID
+    search: Optional[str] = "а"
+    limit: int = Field(50, ge=1, le=5000)
+
+
+class _Explain(Executable, ClauseElement):
+    """EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) <statement> с обычными bind-параметрами."""
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+# Запросы горячих путей, которые можно разобрать EXPLAIN ANALYZE. Собираются
+# теми же построителями, что и ручки (с теми же колонками, сортировкой, LIMIT+1
+# и экранированным ILIKE), поэтому план совпадает с тем, что выполняет ручка.
+# Отчёт аналитики ручка собирает строкой — здесь тот же текст с :project_id.
+EXPLAIN_QUERIES: Dict[str, Callable[[ExplainIn], Executable]] = {
+    "queries_list": lambda p: queries_list_stmt(p.project_id, limit=p.limit),
+    "queries_search": lambda p: queries_list_stmt(p.project_id, search=p.search, limit=p.limit),
+    "queries_count": lambda p: queries_count_stmt(p.project_id),
+    "queries_statistics": lambda p: queries_statistics_stmt(p.project_id),
+    "cluster_registry_list": lambda p: registry_page_stmt(registry_conditions(p.project_id), None, p.limit + 1),
+    "cluster_registry_search": lambda p: registry_page_stmt(
+        registry_conditions(p.project_id, search=p.search), None, p.limit + 1
+    ),
+    "content_plan_list": lambda p: content_plan_page_stmt(
+        filter_conditions(p.project_id, None, None, None, None, None), limit=p.limit + 1
+    ),
+    "content_plan_search": lambda p: content_plan_page_stmt(
+        filter_conditions(p.project_id, p.search, None, None, None, None), limit=p.limit + 1
+    ),
+    "analytics_report": lambda p: text(
+        PERIODS_SQL.format(project_filter="WHERE project_id = :project_id")
+    ).bindparams(project_id=p.project_id),
+}
+
+
+def _stat_statements_unavailable(e: DBAPIError) -> HTTPException:
+    logger.warning("pg_stat_statements недоступен: %s", e.orig)
+    return HTTPException(503, "pg_stat_statements недоступен (нет расширения или не загружен в shared_preload_libraries)")
+
+
+@router.get("/db/top-queries")
+async def top_queries(
+    order_by: str = Q("total", pattern="^(total|mean|calls|rows)$"),
+    limit: int = Q(20, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+):
+    """Топ выражений текущей БД по суммарному/среднему времени, вызовам или строкам"""
+    column = TOP_QUERY_ORDER[order_by]
+    sql = text(f"""
+        SELECT queryid, query, calls, rows,
+               total_exec_time AS total_ms,
+               mean_exec_time AS mean_ms,
+               max_exec_time AS max_ms,
+               shared_blks_hit, shared_blks_read, temp_blks_written
+        FROM pg_stat_statements
+        WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+        ORDER BY {column} DESC
+        LIMIT :limit
+    """)
+    try:
+        rows = (await db.execute(sql, {"limit": limit})).mappings().all()
+    except DBAPIError as e:
+        await db.rollback()
+        raise _stat_statements_unavailable(e)
+
+    items = []
+    for r in rows:
+        hit, read = r["shared_blks_hit"] or 0, r["shared_blks_read"] or 0
+        items.append({
+            "queryid": str(r["queryid"]),
+            "query": r["query"],
+            "calls": r["calls"],
+            "rows": r["rows"],
+            "total_ms": round(r["total_ms"], 3),
+            "mean_ms": round(r["mean_ms"], 3),
+            "max_ms": round(r["max_ms"], 3),
+            "cache_hit_ratio": round(hit / (hit + read), 4) if hit + read else None,
+            "temp_blks_written": r["temp_blks_written"],
+        })
+    return {"order_by": order_by, "items": items}
+
+
+@router.post("/db/top-queries/reset")
+async def reset_top_queries(db: AsyncSession = Depends(get_db)):
+    """Сбросить статистику pg_stat_statements (например, перед замером)"""
+    try:
+        await db.execute(text("SELECT pg_stat_statements_reset()"))
+        await db.commit()
+    except DBAPIError as e:
+        await db.rollback()
+        raise _stat_statements_unavailable(e)
+    return {"ok": True}
+
+
+@router.get("/db/explain")
+async def list_explain_queries():
+    """Запросы, доступные для EXPLAIN"""
+    return {"queries": sorted(EXPLAIN_QUERIES)}
+
+
+@router.post("/db/explain/{name}")
+async def explain_query(name: str, payload: ExplainIn, db: AsyncSession = Depends(get_db)):
+    """
+    EXPLAIN (ANALYZE, BUFFERS) запроса из EXPLAIN_QUERIES.
+
+    ANALYZE реально выполняет запрос — делаем это в транзакции, которая
+    всегда откатывается, и с ограничением statement_timeout.
+    """
+    build = EXPLAIN_QUERIES.get(name)
+    if build is None:
+        raise HTTPException(404, f"Неизвестный запрос: {name}")
+
+    try:
+        await db.execute(text(f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}"))
+        plan = (await db.execute(_Explain(build(payload)))).scalar_one()
+    except DBAPIError as e:
+        raise HTTPException(400, f"EXPLAIN не выполнен: {e.orig}")
+    finally:
+        await db.rollback()
+
+    top = plan[0]
+    return {
+        "name": name,
+        "planning_ms": top.get("Planning Time"),
+        "execution_ms": top.get("Execution Time"),
+        "plan": top["Plan"],
+    }
@@ -12,27 +12,9 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
-@router.get("/report")
-async def get_analytics_report(
-    project_id: Optional[str] = QueryParam(None),
-    db: AsyncSession = Depends(get_db)
-):
-    """
-    Получить аналитический отчет по периодам из контент-плана
-
-    Упрощенная логика на основе существующих полей:
-    - ТЗ: есть ссылка на тз (поле tz)
-    - Написано: есть ссылка на текст (поле review)
-    - Готово: активен чекбокс "проверено врачом" (doctor_approved = true)
-    - Прод: есть ссылка в link, статус "размещено" и есть publish_date
-    """
-    try:
-        project_filter = ""
-        if project_id:
-            project_filter = f"WHERE project_id = '{project_id}'"
-
-        # Основной запрос с упрощенной логикой
-        sql_query = f"""
+# Сводка по периодам; {project_filter} — пусто или WHERE по проекту.
+# Вынесена, чтобы EXPLAIN в admin разбирал тот же SQL.
+PERIODS_SQL = """
         WITH unique_items AS (
             SELECT DISTINCT ON (topic, period, direction, section)
                 *
@@ -56,6 +38,28 @@ async def get_analytics_report(
         ORDER BY period
         """
 
+@router.get("/report")
+async def get_analytics_report(
+    project_id: Optional[str] = QueryParam(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Получить аналитический отчет по периодам из контент-плана
+
+    Упрощенная логика на основе существующих полей:
+    - ТЗ: есть ссылка на тз (поле tz)
+    - Написано: есть ссылка на текст (поле review)
+    - Готово: активен чекбокс "проверено врачом" (doctor_approved = true)
+    - Прод: есть ссылка в link, статус "размещено" и есть publish_date
+    """
+    try:
+        project_filter = ""
+        if project_id:
+            project_filter = f"WHERE project_id = '{project_id}'"
+
+        # Основной запрос с упрощенной логикой
+        sql_query = PERIODS_SQL.format(project_filter=project_filter)
+
         result = await db.execute(text(sql_query))
         periods_data = result.fetchall()
 
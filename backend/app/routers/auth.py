@@ -1,3 +1,4 @@
+import logging
 import uuid
 from typing import Optional
 from uuid import UUID
@@ -8,11 +9,14 @@ from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
-from ..deps import get_current_user
+from ..deps import get_current_user, invalidate_user
+from ..permissions import invalidate_permissions
 from ..db import get_db
 from ..models import User
 from ..schemas import UserCreate, TokenOut
-from ..security import hash_password, verify_password, create_access_token
+from ..security import hash_password, verify_and_update_password, create_access_token
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -28,7 +32,7 @@ async def register(payload: UserCreate, db: AsyncSession = Depends(get_db)):
         id=uuid.uuid4(),
         email=payload.email.strip().lower(),
         name=payload.name,
-        password_hash=hash_password(payload.password),
+        password_hash=await hash_password(payload.password),
         is_active=True,
         is_superuser=(cnt == 0),
         can_view_all_content=False,
@@ -40,13 +44,14 @@ async def register(payload: UserCreate, db: AsyncSession = Depends(get_db)):
     if cnt == 0:
         from .access import set_user_page_roles, PAGES
         admin_roles = {page: "admin" for page in PAGES}
-        set_user_page_roles(u.id, admin_roles)
+        await set_user_page_roles(db, u.id, admin_roles)
 
         # Также добавляем доступ к страницам
         from app.models import PageAccess
         for page in PAGES:
             page_access = PageAccess(user_id=u.id, page=page)
             db.add(page_access)
+        await invalidate_permissions(db, u.id)
         await db.commit()
 
     token = create_access_token(u.id)
@@ -55,10 +60,18 @@ async def register(payload: UserCreate, db: AsyncSession = Depends(get_db)):
 @router.post("/login", response_model=TokenOut)
 async def login(form: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     user = (await db.execute(select(User).where(User.email == form.username.strip().lower()))).scalar_one_or_none()
-    if not user or not user.password_hash or not verify_password(form.password, user.password_hash):
+    if not user or not user.password_hash:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    ok, new_hash = await verify_and_update_password(form.password, user.password_hash)
+    if not ok:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User inactive")
+    if new_hash:
+        # work factor поменялся — пересохраняем хэш
+        user.password_hash = new_hash
+        await db.commit()
+        invalidate_user(user.id)
     token = create_access_token(user.id)
     return TokenOut(access_token=token)
 
@@ -68,7 +81,7 @@ async def list_users(db: AsyncSession = Depends(get_db), current=Depends(get_cur
     if not getattr(current, "is_superuser", False):
         # Проверяем, есть ли у пользователя admin роль хотя бы на одной странице
         from .access import get_user_page_roles
-        user_roles = get_user_page_roles(current.id)
+        user_roles = await get_user_page_roles(db, current.id)
         has_admin_role = any(role == "admin" for role in user_roles.values())
 
         if not has_admin_role:
@@ -78,10 +91,11 @@ async def list_users(db: AsyncSession = Depends(get_db), current=Depends(get_cur
     q = select(User.id, User.email, User.name, User.is_active, User.is_superuser, User.can_view_all_content)
     rows = (await db.execute(q)).all()
 
-    from .access import get_user_page_roles
+    from .access import get_users_page_roles
+    roles_by_user = await get_users_page_roles(db, [r.id for r in rows])
     result = []
     for r in rows:
-        user_roles = get_user_page_roles(r.id)
+        user_roles = roles_by_user[r.id]
         result.append({
             "id": str(r.id),
             "email": r.email,
@@ -121,19 +135,10 @@ async def update_user_content_access(
     current_user: User = Depends(get_current_user)
 ):
     """Обновить настройку доступа пользователя к контенту"""
-
-    import logging
-    logger = logging.getLogger(__name__)
-
-    logger.info(f"🔄 Updating content access for user {user_id}")
-    logger.info(f"  Payload: {payload}")  # ДОБАВЛЕНО: для отладки
-    logger.info(f"  New can_view_all_content: {payload.can_view_all_content}")
-    logger.info(f"  Requested by: {current_user.id}")
-
     # Проверяем права: суперпользователь или admin роль на content_plan
     if not current_user.is_superuser:
         from .access import get_user_page_roles
-        user_roles = get_user_page_roles(current_user.id)
+        user_roles = await get_user_page_roles(db, current_user.id)
         content_plan_role = user_roles.get("content_plan", "viewer")
 
         if content_plan_role != "admin":
@@ -146,18 +151,22 @@ async def update_user_content_access(
     if not user:
         raise HTTPException(404, "Пользователь не найден")
 
-    logger.info(f"  Current can_view_all_content: {getattr(user, 'can_view_all_content', 'NOT_SET')}")
-
     # Обновляем поле
     user.can_view_all_content = payload.can_view_all_content
 
     try:
+        # поле управляет видимостью контента — другие воркеры должны сбросить кэш пользователя
+        await invalidate_permissions(db, user.id)
         await db.commit()
         await db.refresh(user)
-        logger.info(f"  Successfully updated can_view_all_content: {user.can_view_all_content}")
+        invalidate_user(user.id)
+        logger.info(
+            "can_view_all_content=%s для пользователя %s (изменил %s)",
+            user.can_view_all_content, user_id, current_user.id,
+        )
     except Exception as e:
         await db.rollback()
-        logger.error(f"Error updating user content access: {e}")
+        logger.error("Error updating user content access: %s", e)
         raise HTTPException(500, f"Ошибка обновления настроек доступа: {str(e)}")
 
     return {
@@ -167,10 +176,10 @@ async def update_user_content_access(
     }
 
 @router.get("/me")
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Получить информацию о текущем пользователе включая роли"""
     from .access import get_user_page_roles
-    user_roles = get_user_page_roles(current_user.id)
+    user_roles = await get_user_page_roles(db, current_user.id)
 
     return {
         "id": str(current_user.id),
@@ -193,7 +202,7 @@ async def get_user_permissions(
     # Проверяем права доступа
     if not current_user.is_superuser and current_user.id != user_id:
         from .access import get_user_page_roles
-        user_roles = get_user_page_roles(current_user.id)
+        user_roles = await get_user_page_roles(db, current_user.id)
         has_admin_role = any(role == "admin" for role in user_roles.values())
 
         if not has_admin_role:
@@ -204,7 +213,7 @@ async def get_user_permissions(
         raise HTTPException(404, "Пользователь не найден")
 
     from .access import get_user_page_roles, check_role_permissions, PAGES
-    user_roles = get_user_page_roles(user_id)
+    user_roles = await get_user_page_roles(db, user_id)
 
     permissions = {}
     for page in PAGES:
@@ -1,11 +1,10 @@
 from __future__ import annotations
 
-import csv
-import io
+import base64
 import uuid
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, UploadFile, File
 from sqlalchemy import select, update, delete, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.dialects.postgresql import insert as pg_insert
@@ -15,34 +14,135 @@ from ..models import ClusterRegistry, ProjectMember
 from ..schemas import ClusterRegRowIn, ClusterRegRowOut, ClusterRegUpdate, ClusterRegBulkIn
 from ..deps import get_current_user, require_project_role
 from ..routers.access import require_page_access
+from ..metrics import IMPORTS, IMPORTED_ROWS
+from ..sqlutil import ilike_contains
+from ..services.cluster_registry import (
+    UPSERT_BATCH_SIZE,
+    InvalidImportFile,
+    import_registry_batches,
+    iter_csv_batches,
+    iter_xlsx_batches,
+    strip_derived,
+    upsert_registry_rows,
+)
 
 router = APIRouter(prefix="/cluster-registry", tags=["cluster-registry"])
 
 
 # -----------------------
 # LIST (только просмотр)
+# Keyset-пагинация по name (уникально в проекте). Без limit и cursor — все строки
+# одним ответом, как до пагинации (для старых клиентов). Метаданные — в заголовках:
+#   X-Total-Count — всего строк под фильтром (with_total=false, чтобы не считать)
+#   X-Next-Cursor — курсор следующей страницы (нет заголовка — страница последняя)
 # -----------------------
+_LIST_COLUMNS = tuple(ClusterRegRowOut.model_fields)
+# размер страницы, если пришёл cursor без limit
+DEFAULT_PAGE_SIZE = 500
+
+
+def _encode_cursor(name: str) -> str:
+    return base64.urlsafe_b64encode(name.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+    except Exception:
+        raise HTTPException(400, "Некорректный курсор")
+
+
+def registry_conditions(
+    project_id: uuid.UUID,
+    direction: Optional[str] = None,
+    page_type: Optional[str] = None,
+    has_core: Optional[bool] = None,
+    has_brief: Optional[bool] = None,
+    is_published: Optional[bool] = None,
+    demand_min: Optional[int] = None,
+    demand_max: Optional[int] = None,
+    search: Optional[str] = None,
+) -> list:
+    """Фильтры списка реестра — общие для страницы, X-Total-Count и EXPLAIN в admin."""
+    t = ClusterRegistry.__table__
+    conds = [t.c.project_id == project_id]
+    if direction:
+        conds.append(t.c.direction == direction)
+    if page_type:
+        conds.append(t.c.page_type == page_type)
+    if has_core is not None:
+        conds.append(t.c.has_core == has_core)
+    if has_brief is not None:
+        conds.append(t.c.has_brief == has_brief)
+    if is_published is not None:
+        conds.append(t.c.is_published == is_published)
+    if demand_min is not None:
+        conds.append(t.c.demand >= demand_min)
+    if demand_max is not None:
+        conds.append(t.c.demand <= demand_max)
+    if search and search.strip():
+        # ILIKE '%…%' обслуживается GIN-индексом ix_cluster_registry_name_trgm
+        conds.append(ilike_contains(t.c.name, search.strip()))
+    return conds
+
+
+def registry_page_stmt(conds: list, after: Optional[str], limit: Optional[int]):
+    """Страница реестра по keyset (name > after); limit=None — все строки."""
+    t = ClusterRegistry.__table__
+    stmt = select(*(t.c[name] for name in _LIST_COLUMNS)).where(*conds)
+    if after is not None:
+        stmt = stmt.where(t.c.name > after)
+    stmt = stmt.order_by(t.c.name)
+    return stmt if limit is None else stmt.limit(limit)
+
+
 @router.get("", response_model=List[ClusterRegRowOut])
 async def list_registry(
+    response: Response,
     project_id: uuid.UUID = Query(...),
+    direction: Optional[str] = Query(None),
+    page_type: Optional[str] = Query(None),
+    has_core: Optional[bool] = Query(None),
+    has_brief: Optional[bool] = Query(None),
+    is_published: Optional[bool] = Query(None),
+    demand_min: Optional[int] = Query(None, ge=0),
+    demand_max: Optional[int] = Query(None, ge=0),
+    search: Optional[str] = Query(None, description="Подстрока в названии кластера"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor предыдущей страницы"),
+    limit: Optional[int] = Query(None, ge=1, le=5000, description="Без limit и cursor — все строки"),
+    with_total: bool = Query(True),
     db: AsyncSession = Depends(get_db),
     user=Depends(get_current_user),
 ):
     await require_page_access(db, user, "clusters", "viewer")
     await require_project_role(project_id, user, db, roles=("viewer", "editor", "admin"))
-    
-    rows = (
-        await db.execute(
-            select(ClusterRegistry)
-            .where(ClusterRegistry.project_id == project_id)
-            .order_by(ClusterRegistry.name)
-        )
-    ).scalars().all()
-    return [ClusterRegRowOut.model_validate(r) for r in rows]
+
+    conds = registry_conditions(
+        project_id, direction, page_type, has_core, has_brief, is_published, demand_min, demand_max, search,
+    )
+    if with_total:
+        t = ClusterRegistry.__table__
+        total = (await db.execute(select(func.count()).select_from(t).where(*conds))).scalar_one()
+        response.headers["X-Total-Count"] = str(total)
+
+    if limit is None and not cursor:
+        return (await db.execute(registry_page_stmt(conds, None, None))).all()
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    after = _decode_cursor(cursor) if cursor else None
+    # берём на одну строку больше, чтобы понять, есть ли следующая страница
+    stmt = registry_page_stmt(conds, after, limit + 1)
+
+    rows = (await db.execute(stmt)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1].name)
+    return rows
 
 
 # -----------------------
 # UPSERT ROW (требует editor)
+# demand / has_core / is_published игнорируются — их ведут триггеры по queries
 # -----------------------
 @router.post("", response_model=ClusterRegRowOut)
 async def upsert_row(
@@ -53,23 +153,27 @@ async def upsert_row(
     await require_page_access(db, user, "clusters", "editor")
     await require_project_role(payload.project_id, user, db, roles=("editor", "admin"))
 
-    insert_stmt = pg_insert(ClusterRegistry).values(
-        **{**payload.model_dump(), "demand": payload.demand or 0}
-    )
-    stmt = insert_stmt.on_conflict_do_update(
+    stmt = pg_insert(ClusterRegistry).values(**strip_derived(payload.model_dump()))
+    stmt = stmt.on_conflict_do_update(
         index_elements=[ClusterRegistry.project_id, ClusterRegistry.name],
         set_={
             "direction": payload.direction,
             "page_type": payload.page_type,
-            "has_core": payload.has_core,
             "has_brief": payload.has_brief,
-            "is_published": payload.is_published,
-            "demand": payload.demand or 0,
             "updated_at": func.now(),
         },
-    ).returning(ClusterRegistry)
+    )
+    await db.execute(stmt)
 
-    row = (await db.execute(stmt)).scalars().first()
+    # метрики новой строки проставляет statement-триггер, поэтому читаем после вставки
+    row = (
+        await db.execute(
+            select(ClusterRegistry).where(
+                ClusterRegistry.project_id == payload.project_id,
+                ClusterRegistry.name == payload.name,
+            )
+        )
+    ).scalar_one()
     await db.commit()
     return ClusterRegRowOut.model_validate(row)
 
@@ -91,7 +195,7 @@ async def update_row(
     await require_page_access(db, user, "clusters", "editor")
     await require_project_role(r.project_id, user, db, roles=("editor", "admin"))
 
-    upd = {k: v for k, v in payload.model_dump().items() if v is not None}
+    upd = {k: v for k, v in strip_derived(payload.model_dump()).items() if v is not None}
     if upd:
         upd["updated_at"] = func.now()
         await db.execute(update(ClusterRegistry).where(ClusterRegistry.id == row_id).values(**upd))
@@ -134,53 +238,25 @@ async def bulk_upsert(
     await require_page_access(db, user, "clusters", "editor")
     await require_project_role(payload.project_id, user, db, roles=("editor", "admin"))
 
-    for row in payload.rows:
-        if row.project_id != payload.project_id:
-            raise HTTPException(400, "All rows must have the same project_id")
+    if any(row.project_id != payload.project_id for row in payload.rows):
+        raise HTTPException(400, "All rows must have the same project_id")
 
-        insert_stmt = pg_insert(ClusterRegistry).values(
-            **{**row.model_dump(), "demand": row.demand or 0}
-        )
-        stmt = insert_stmt.on_conflict_do_update(
-            index_elements=[ClusterRegistry.project_id, ClusterRegistry.name],
-            set_={
-                "direction": row.direction,
-                "page_type": row.page_type,
-                "has_core": row.has_core,
-                "has_brief": row.has_brief,
-                "is_published": row.is_published,
-                "demand": row.demand or 0,
-                "updated_at": func.now(),
-            },
-        )
-        await db.execute(stmt)
+    rows = [row.model_dump() for row in payload.rows]
+    created = updated = 0
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        c, u = await upsert_registry_rows(db, payload.project_id, rows[start:start + UPSERT_BATCH_SIZE])
+        created += c
+        updated += u
 
     await db.commit()
-    return {"ok": True}
+    IMPORTS.labels("cluster_registry_bulk").inc()
+    IMPORTED_ROWS.labels("cluster_registry_bulk").inc(len(rows))
+    return {"ok": True, "created": created, "updated": updated}
 
 
 # -----------------------
 # CSV IMPORT (требует editor)
 # -----------------------
-def _parse_bool(v) -> bool:
-    if isinstance(v, bool):
-        return v
-    s = (str(v) if v is not None else "").strip().lower()
-    return s in {"1", "true", "t", "yes", "y", "да", "истина", "on", "+"}
-
-
-def _parse_int(v, default: int = 0) -> int:
-    if v is None:
-        return default
-    s = str(v).strip()
-    if s == "":
-        return default
-    try:
-        return int(float(s.replace(" ", "")))
-    except Exception:
-        return default
-
-
 @router.post("/import-csv")
 async def import_csv(
     project_id: uuid.UUID,
@@ -191,77 +267,40 @@ async def import_csv(
     await require_page_access(db, user, "clusters", "editor")
     await require_project_role(project_id, user, db, roles=("editor", "admin"))
 
-    raw = await file.read()
+    # Файл уже лежит во временном SpooledTemporaryFile — читаем его потоково, пачками
     try:
-        text = raw.decode("utf-8-sig")
-    except UnicodeDecodeError:
-        text = raw.decode("cp1251")
-
-    reader = csv.DictReader(io.StringIO(text), delimiter=",")
+        result = await import_registry_batches(db, project_id, iter_csv_batches(file.file))
+    except InvalidImportFile as e:
+        await db.rollback()
+        raise HTTPException(400, str(e))
 
-    processed = created = updated = 0
-    errors: list[str] = []
+    await db.commit()
+    IMPORTS.labels("cluster_registry_csv").inc()
+    IMPORTED_ROWS.labels("cluster_registry_csv").inc(result["processed"])
+    return result
 
-    existing_names = set(
-        (await db.execute(select(ClusterRegistry.name).where(ClusterRegistry.project_id == project_id))).scalars().all()
-    )
 
-    for idx, row in enumerate(reader, start=2):
-        name = (row.get("Кластер") or row.get("кластер") or "").strip()
-        if not name:
-            errors.append(f"Строка {idx}: пустое поле «Кластер»")
-            continue
-
-        direction = (row.get("Направление") or row.get("направление") or None)
-        direction = direction.strip() if direction else None
-
-        page_type = (row.get("Тип страницы") or row.get("тип страницы") or None)
-        page_type = page_type.strip() if page_type else None
-
-        has_core = _parse_bool(row.get("Ядро"))
-        has_brief = _parse_bool(row.get("ТЗ"))
-        is_published = _parse_bool(row.get("Размещено"))
-        demand = _parse_int(row.get("Спрос"), default=0)
-
-        stmt = (
-            pg_insert(ClusterRegistry)
-            .values(
-                id=uuid.uuid4(),
-                project_id=project_id,
-                name=name,
-                direction=direction,
-                page_type=page_type,
-                has_core=has_core,
-                has_brief=has_brief,
-                is_published=is_published,
-                demand=demand,
-            )
-            .on_conflict_do_update(
-                index_elements=[ClusterRegistry.project_id, ClusterRegistry.name],
-                set_={
-                    "direction": direction,
-                    "page_type": page_type,
-                    "has_core": has_core,
-                    "has_brief": has_brief,
-                    "is_published": is_published,
-                    "demand": demand,
-                    "updated_at": func.now(),
-                },
-            )
-        )
-        await db.execute(stmt)
-        processed += 1
+# -----------------------
+# XLSX IMPORT (требует editor)
+# -----------------------
+@router.post("/import-xlsx")
+async def import_xlsx(
+    project_id: uuid.UUID,
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    await require_page_access(db, user, "clusters", "editor")
+    await require_project_role(project_id, user, db, roles=("editor", "admin"))
 
-        if name in existing_names:
-            updated += 1
-        else:
-            created += 1
-            existing_names.add(name)
+    try:
+        batches = iter_xlsx_batches(file.file)
+        result = await import_registry_batches(db, project_id, batches)
+    except InvalidImportFile as e:
+        await db.rollback()
+        raise HTTPException(400, str(e))
 
     await db.commit()
-    return {
-        "processed": processed,
-        "created": created,
-        "updated": updated,
-        "errors": errors,
-    }
\ No newline at end of file
+    IMPORTS.labels("cluster_registry_xlsx").inc()
+    IMPORTED_ROWS.labels("cluster_registry_xlsx").inc(result["processed"])
+    return result
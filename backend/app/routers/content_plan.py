@@ -1,18 +1,29 @@
 from __future__ import annotations
 
+import base64
+import hashlib
+import logging
 import uuid
 import datetime as dt
+from collections import Counter, defaultdict
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query as Q, Body
-from sqlalchemy import select, func, or_, delete
+from fastapi import APIRouter, Depends, HTTPException, Query as Q, Body, Response
+from sqlalchemy import select, insert, update, func, or_, delete, tuple_, any_, bindparam, String, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..deps import get_current_user, get_db, require_project_role
+from ..deps import get_current_user, get_db, require_project_role, require_project_roles
+from ..logutil import log_access
+from ..metrics import IMPORTS, IMPORTED_ROWS
+from ..permissions import get_permissions
+from ..sqlutil import ilike_contains
 from ..models import ContentPlanItem, User, TechnicalSpecification
 from .. import schemas as S
 from ..routers.access import require_page_access
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/content-plan", tags=["content-plan"])
 
 
@@ -23,62 +34,53 @@ def _str_or_none(v):
     return s if s else None
 
 
-def _apply_str_fields(obj, payload: dict):
-    for attr in (
-        "period",
-        "section",
-        "direction",
-        "topic",
-        "tz",
-        "status",
-        "author",
-        "reviewing_doctor",
-        "review",
-        "meta_seo",
-        "publish_allowed",
-        "comment",
-        "link",
-    ):
+_STR_FIELDS = (
+    "period",
+    "section",
+    "direction",
+    "topic",
+    "tz",
+    "status",
+    "author",
+    "reviewing_doctor",
+    "review",
+    "meta_seo",
+    "comment",
+    "link",
+)
+
+
+# всё, что _item_values может заполнить, — для executemany с одинаковым набором колонок
+_IMPORT_COLUMNS = (*_STR_FIELDS, "chars", "publish_date", "doctor_approved", "doctor_review")
+
+
+def _item_values(payload: dict) -> dict:
+    """Значения колонок ContentPlanItem из переданных полей payload."""
+    values = {attr: _str_or_none(payload.get(attr)) for attr in _STR_FIELDS if attr in payload}
+    for attr in ("chars", "publish_date", "doctor_approved", "doctor_review"):
         if attr in payload:
-            setattr(obj, attr, _str_or_none(payload.get(attr)))
-    if "chars" in payload:
-        obj.chars = payload.get("chars")
-    if "publish_date" in payload:
-        obj.publish_date = payload.get("publish_date")
-    if "doctor_approved" in payload:
-            obj.doctor_approved = payload.get("doctor_approved")
-    if "publish_allowed" in payload:
-            publish_allowed_value = payload.get("publish_allowed")
-
-            # Сохраняем исходное значение
-            obj.publish_allowed = _str_or_none(publish_allowed_value)
-
-            # Если значение "готово" - устанавливаем doctor_approved = True
-            if publish_allowed_value:
-                value_str = str(publish_allowed_value).strip().lower()
-                if value_str in ["готово", "да", "yes", "true", "1"]:
-                    obj.doctor_approved = True
-                    print(f"✅ Установлен doctor_approved=True для значения '{publish_allowed_value}'")
-                elif value_str in ["нет", "no", "false", "0"]:
-                    obj.doctor_approved = False
+            values[attr] = payload.get(attr)
+    # publish_allowed в БД нет: «готово»/«нет» из старого поля переводим в doctor_approved
+    publish_allowed_value = payload.get("publish_allowed")
+    if publish_allowed_value:
+        value_str = str(publish_allowed_value).strip().lower()
+        if value_str in ["готово", "да", "yes", "true", "1"]:
+            values["doctor_approved"] = True
+        elif value_str in ["нет", "no", "false", "0"]:
+            values["doctor_approved"] = False
+    return values
 
 
-async def check_content_plan_edit_access(db: AsyncSession, user: User, item: ContentPlanItem):
-    """Проверяет права на редактирование записи контент-плана"""
-    import logging
-    logger = logging.getLogger(__name__)
+def _apply_str_fields(obj, payload: dict):
+    for attr, value in _item_values(payload).items():
+        setattr(obj, attr, value)
 
-    logger.info(f"🔍 EDIT ACCESS CHECK:")
-    logger.info(f"  User ID: {user.id}")
-    logger.info(f"  User email: {user.email}")
-    logger.info(f"  is_superuser: {user.is_superuser}")
-    logger.info(f"  Item ID: {item.id}")
-    logger.info(f"  Item author: {item.author}")
-    logger.info(f"  Item created_by: {item.created_by}")
 
+async def check_content_plan_edit_access(db: AsyncSession, user: User, item: ContentPlanItem):
+    """Проверяет права на редактирование записи контент-плана"""
     # Суперпользователь может все
     if user.is_superuser:
-        logger.info(f"✅ Superuser access granted")
+        log_access(logger, "edit", user, "allow", item_id=item.id)
         return True
 
     # Проверяем базовый доступ к странице
@@ -86,43 +88,32 @@ async def check_content_plan_edit_access(db: AsyncSession, user: User, item: Con
 
     # Получаем роль пользователя
     from .access import get_user_page_roles
-    user_roles = get_user_page_roles(user.id)
+    user_roles = await get_user_page_roles(db, user.id)
     page_role = user_roles.get("content_plan", "viewer")
 
-    logger.info(f"  Page role: {page_role}")
-
     # Admin и Editor могут редактировать все
     if page_role in ("admin", "editor"):
-        logger.info(f"✅ Admin/Editor access granted")
+        log_access(logger, "edit", user, "allow", page_role, item_id=item.id)
         return True
 
     # Author может редактировать только свои тексты
     if page_role == "author":
-        user_id_str = str(user.id)
-        is_owner = (item.author == user_id_str or item.created_by == user.id)
-
-        logger.info(f"🔍 Author ownership check: user_id_str={user_id_str}, is_owner={is_owner}")
-
-        if is_owner:
-            logger.info(f"✅ Author owner access granted")
+        if item.author == str(user.id) or item.created_by == user.id:
+            log_access(logger, "edit", user, "allow", page_role, item_id=item.id, owner=True)
             return True
-        else:
-            logger.error(f"❌ Author access denied: not owner")
-            raise HTTPException(403, "Author может редактировать только свои записи")
+        log_access(logger, "edit", user, "deny", page_role, item_id=item.id, owner=False)
+        raise HTTPException(403, "Author может редактировать только свои записи")
 
     # Viewer не может редактировать
-    logger.error(f"❌ Access denied for role: {page_role}")
+    log_access(logger, "edit", user, "deny", page_role, item_id=item.id)
     raise HTTPException(403, "Нет прав на редактирование")
 
 
 async def check_content_plan_create_access(db: AsyncSession, user: User):
     """Проверяет права на создание записей контент-плана"""
-    import logging
-    logger = logging.getLogger(__name__)
-
     # Суперпользователь может все
     if user.is_superuser:
-        logger.info(f"✅ Superuser create access granted for user {user.id}")
+        log_access(logger, "create", user, "allow")
         return True
 
     # Проверяем базовый доступ к странице
@@ -130,86 +121,187 @@ async def check_content_plan_create_access(db: AsyncSession, user: User):
 
     # Получаем роль пользователя
     from .access import get_user_page_roles
-    user_roles = get_user_page_roles(user.id)
+    user_roles = await get_user_page_roles(db, user.id)
     page_role = user_roles.get("content_plan", "viewer")
 
-    logger.info(f"🔍 CREATE ACCESS CHECK:")
-    logger.info(f"  User ID: {user.id}")
-    logger.info(f"  Page role: {page_role}")
-
     # Admin, Editor и Author могут создавать записи
     if page_role in ("admin", "editor", "author"):
-        logger.info(f"✅ Create access granted for role: {page_role}")
+        log_access(logger, "create", user, "allow", page_role)
         return True
 
     # Viewer не может создавать
-    logger.info(f"❌ Create access denied for role: {page_role}")
+    log_access(logger, "create", user, "deny", page_role)
     raise HTTPException(403, "Нет прав на создание записей контент-плана")
 
 
-async def check_content_plan_delete_access(db: AsyncSession, user: User, item: ContentPlanItem):
-    """Проверяет права на удаление записи контент-плана"""
-    import logging
-    logger = logging.getLogger(__name__)
-
+async def check_content_plan_delete_access(db: AsyncSession, user: User):
+    """Проверяет права на удаление записей контент-плана"""
     # Суперпользователь может все
     if user.is_superuser:
-        logger.info(f"✅ Superuser delete access granted")
+        log_access(logger, "delete", user, "allow")
         return True
 
     # Получаем роль пользователя
     from .access import get_user_page_roles
-    user_roles = get_user_page_roles(user.id)
+    user_roles = await get_user_page_roles(db, user.id)
     page_role = user_roles.get("content_plan", "viewer")
 
-    logger.info(f"🔍 DELETE ACCESS CHECK:")
-    logger.info(f"  User ID: {user.id}")
-    logger.info(f"  Page role: {page_role}")
-
     # Только Admin и Editor могут удалять
     if page_role in ("admin", "editor"):
-        logger.info(f"✅ Delete access granted for role: {page_role}")
+        log_access(logger, "delete", user, "allow", page_role)
         return True
 
     # Author и Viewer не могут удалять
-    logger.info(f"❌ Delete access denied for role: {page_role}")
+    log_access(logger, "delete", user, "deny", page_role)
     raise HTTPException(403, "Нет прав на удаление записей")
 
 
 async def check_content_plan_import_access(db: AsyncSession, user: User):
     """Проверяет права на импорт записей контент-плана"""
-    import logging
-    logger = logging.getLogger(__name__)
-
     # Суперпользователь может все
     if user.is_superuser:
-        logger.info(f"✅ Superuser import access granted")
+        log_access(logger, "import", user, "allow")
         return True
 
     # Получаем роль пользователя
     from .access import get_user_page_roles
-    user_roles = get_user_page_roles(user.id)
+    user_roles = await get_user_page_roles(db, user.id)
     page_role = user_roles.get("content_plan", "viewer")
 
-    logger.info(f"🔍 IMPORT ACCESS CHECK:")
-    logger.info(f"  User ID: {user.id}")
-    logger.info(f"  Page role: {page_role}")
-
     # Только Admin и Editor могут импортировать
     if page_role in ("admin", "editor"):
-        logger.info(f"✅ Import access granted for role: {page_role}")
+        log_access(logger, "import", user, "allow", page_role)
         return True
 
     # Author и Viewer не могут импортировать
-    logger.info(f"❌ Import access denied for role: {page_role}")
+    log_access(logger, "import", user, "deny", page_role)
     raise HTTPException(403, "Нет прав на импорт записей")
 
 
 # -----------------------
 # LIST (только просмотр)
+# Keyset-пагинация по (created_at, id) — от новых к старым. Курсор следующей
+# страницы — в заголовке X-Next-Cursor (нет заголовка — страница последняя);
+# offset оставлен для старых клиентов и без cursor.
+# fields=topic,status,... — только эти колонки (id, created_at, updated_at есть всегда),
+# чтобы грид не тянул тяжёлые tz / meta_seo / comment.
 # -----------------------
-@router.get("", response_model=List[S.ContentPlanItemOut])
+_ITEM_COLUMNS = {c.name: c for c in ContentPlanItem.__table__.columns}
+# колонки ContentPlanItemOut — для RETURNING при записи
+_OUT_COLUMNS = tuple(c for name, c in _ITEM_COLUMNS.items() if name in S.ContentPlanItemOut.model_fields)
+_ALWAYS_FIELDS = ("id", "created_at", "updated_at")
+_TZ_FIELDS = ("has_technical_specification", "technical_specification_id")
+_LIST_FIELDS = tuple(f for f in S.ContentPlanItemOut.model_fields if f in _ITEM_COLUMNS or f in _TZ_FIELDS)
+
+
+def _encode_cursor(created_at: dt.datetime, item_id: uuid.UUID) -> str:
+    raw = f"{created_at.isoformat()}|{item_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple[dt.datetime, uuid.UUID]:
+    try:
+        created_at, item_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return dt.datetime.fromisoformat(created_at), uuid.UUID(item_id)
+    except Exception:
+        raise HTTPException(400, "Некорректный курсор")
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[tuple]:
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = sorted(set(requested) - set(_LIST_FIELDS))
+    if unknown:
+        raise HTTPException(400, f"Неизвестные поля: {', '.join(unknown)}")
+    return tuple(dict.fromkeys((*_ALWAYS_FIELDS, *requested)))
+
+
+def filter_conditions(
+    project_id: Optional[uuid.UUID],
+    search: Optional[str],
+    status: Optional[str],
+    period: Optional[str],
+    author: Optional[str],
+    reviewing_doctor: Optional[str],
+) -> list:
+    """Фильтры списка (без учёта прав) — общие для list, count, bulk и EXPLAIN в admin."""
+    conds = []
+    if project_id:
+        conds.append(ContentPlanItem.project_id == project_id)
+    if status:
+        conds.append(ContentPlanItem.status == status)
+    if period:
+        conds.append(ContentPlanItem.period == period)
+    if author:
+        conds.append(ContentPlanItem.author == author)
+    if reviewing_doctor:
+        conds.append(ilike_contains(ContentPlanItem.reviewing_doctor, reviewing_doctor))
+    if search:
+        # по словам (с морфологией) — GIN по search_tsv; подстрока — trigram GIN по search_text
+        conds.append(
+            or_(
+                ContentPlanItem.search_tsv.op("@@")(func.websearch_to_tsquery("russian", search)),
+                ilike_contains(ContentPlanItem.search_text, search),
+            )
+        )
+    return conds
+
+
+async def _list_conditions(
+    db: AsyncSession,
+    user: User,
+    project_id: Optional[uuid.UUID],
+    search: Optional[str],
+    status: Optional[str],
+    period: Optional[str],
+    author: Optional[str],
+    reviewing_doctor: Optional[str],
+) -> list:
+    """Фильтры списка и счётчика (включая видимость для роли author)."""
+    conds = filter_conditions(project_id, search, status, period, author, reviewing_doctor)
+
+    page_role, scope = None, "all"
+    if not user.is_superuser:
+        from .access import get_user_page_roles
+        user_roles = await get_user_page_roles(db, user.id)
+        page_role = user_roles.get("content_plan", "viewer")
+        # author без can_view_all_content видит только свои записи; остальные роли — все
+        if page_role == "author" and not getattr(user, "can_view_all_content", False):
+            conds.append(or_(ContentPlanItem.author == str(user.id), ContentPlanItem.created_by == user.id))
+            scope = "own"
+    log_access(logger, "list", user, "allow", page_role, scope=scope, project_id=project_id)
+    return conds
+
+
+def list_page_stmt(
+    conds: list,
+    out_fields: tuple = _LIST_FIELDS,
+    after: Optional[tuple[dt.datetime, uuid.UUID]] = None,
+    offset: int = 0,
+    limit: int = 50,
+):
+    """SELECT страницы списка: нужные колонки, ТЗ — только если запрошено, keyset по (created_at, id)."""
+    T = TechnicalSpecification
+    columns = [_ITEM_COLUMNS[f] for f in out_fields if f in _ITEM_COLUMNS]
+    with_tz = any(f in _TZ_FIELDS for f in out_fields)
+    if with_tz:
+        columns.append(T.id.label("technical_specification_id"))
+
+    stmt = select(*columns).where(*conds)
+    if with_tz:
+        # ТЗ у записи не больше одного (UNIQUE content_plan_id)
+        stmt = stmt.outerjoin(T, T.content_plan_id == ContentPlanItem.id)
+    if after is not None:
+        stmt = stmt.where(tuple_(ContentPlanItem.created_at, ContentPlanItem.id) < tuple_(*after))
+    elif offset:
+        stmt = stmt.offset(offset)
+    return stmt.order_by(ContentPlanItem.created_at.desc(), ContentPlanItem.id.desc()).limit(limit)
+
+
+@router.get("", response_model=List[S.ContentPlanItemOut], response_model_exclude_unset=True)
 async def list_content_plan(
+    response: Response,
     db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
     project_id: Optional[uuid.UUID] = Q(default=None),
@@ -218,105 +310,43 @@ async def list_content_plan(
     period: Optional[str] = Q(default=None),
     author: Optional[str] = Q(default=None),
     reviewing_doctor: Optional[str] = Q(default=None),
+    fields: Optional[str] = Q(default=None, description="Колонки через запятую; по умолчанию — все"),
+    cursor: Optional[str] = Q(default=None, description="X-Next-Cursor предыдущей страницы"),
     limit: int = Q(default=50, ge=1, le=500),
     offset: int = Q(default=0, ge=0),
 ):
-    import logging
-    logger = logging.getLogger(__name__)
-
     await require_page_access(db, user, "content_plan", "viewer")
     if project_id:
         await require_project_role(project_id, user, db, roles=("viewer", "editor", "admin"))
 
-    stmt = select(ContentPlanItem).order_by(ContentPlanItem.created_at.desc())
-
-    if project_id:
-        stmt = stmt.where(ContentPlanItem.project_id == project_id)
-
-    logger.info(f"🔍 LIST ACCESS CHECK:")
-    logger.info(f"  User ID: {user.id}")
-    logger.info(f"  is_superuser: {user.is_superuser}")
-
-    # ИСПРАВЛЕННАЯ ЛОГИКА ФИЛЬТРАЦИИ
-    if not user.is_superuser:
-        from .access import get_user_page_roles
-        user_roles = get_user_page_roles(user.id)
-        page_role = user_roles.get("content_plan", "viewer")
-
-        logger.info(f"  Page role: {page_role}")
-
-        # Только для роли author применяем фильтрацию
-        if page_role == "author":
-            can_view_all = getattr(user, 'can_view_all_content', False)
-            logger.info(f"  Author can_view_all_content: {can_view_all}")
-
-            if not can_view_all:
-                user_id_str = str(user.id)
-                logger.info(f"  Filtering by author: {user_id_str}")
-
-                stmt = stmt.where(
-                    or_(
-                        ContentPlanItem.author == user_id_str,
-                        ContentPlanItem.created_by == user.id
-                    )
-                )
-            else:
-                logger.info(f"  Author can view all content - no filter applied")
-        else:
-            # Admin, Editor, Viewer - видят все записи без фильтрации
-            logger.info(f"  Role {page_role} - no filter applied")
-
-    # Остальные фильтры остаются без изменений
-    if status:
-        stmt = stmt.where(ContentPlanItem.status == status)
-    if period:
-        stmt = stmt.where(ContentPlanItem.period == period)
-    if author:
-        stmt = stmt.where(ContentPlanItem.author == author)
-    if reviewing_doctor:
-        stmt = stmt.where(ContentPlanItem.reviewing_doctor.ilike(f"%{reviewing_doctor}%"))
-    if search:
-        like = f"%{search}%"
-        stmt = stmt.where(
-            or_(
-                ContentPlanItem.topic.ilike(like),
-                ContentPlanItem.section.ilike(like),
-                ContentPlanItem.direction.ilike(like),
-                ContentPlanItem.comment.ilike(like),
-                ContentPlanItem.meta_seo.ilike(like),
-                ContentPlanItem.author.ilike(like),
-            )
-        )
+    projection = _parse_fields(fields)
+    out_fields = projection or _LIST_FIELDS
+    conds = await _list_conditions(db, user, project_id, search, status, period, author, reviewing_doctor)
 
-    rows = (await db.execute(stmt.limit(limit).offset(offset))).scalars().all()
+    with_tz = any(f in _TZ_FIELDS for f in out_fields)
+    after = _decode_cursor(cursor) if cursor else None
+    # берём на одну строку больше, чтобы понять, есть ли следующая страница
+    stmt = list_page_stmt(conds, out_fields, after, offset, limit + 1)
 
-    logger.info(f"  Found {len(rows)} records after filtering")
+    rows = (await db.execute(stmt)).mappings().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
 
-    # ← ДОБАВИТЬ ЭТОТ БЛОК: Получаем информацию о ТЗ
-    item_ids = [row.id for row in rows]
-
-    # Получаем все ТЗ для найденных элементов
-    tz_result = await db.execute(
-        select(TechnicalSpecification.content_plan_id, TechnicalSpecification.id)
-        .where(TechnicalSpecification.content_plan_id.in_(item_ids))
-    )
-    tz_map = {content_plan_id: tz_id for content_plan_id, tz_id in tz_result.fetchall()}
-
-    # Преобразуем в response схему с информацией о ТЗ
-    response_items = []
+    # без fields= отдаём полный набор полей схемы, как раньше (включая publish_allowed)
+    defaults = {} if projection else {f: info.default for f, info in S.ContentPlanItemOut.model_fields.items()
+                                       if f not in _LIST_FIELDS}
+    items = []
     for row in rows:
-        # Получаем все атрибуты объекта как словарь
-        item_dict = {}
-        for column in ContentPlanItem.__table__.columns:
-            item_dict[column.name] = getattr(row, column.name)
-
-        # Добавляем информацию о ТЗ
-        item_dict["has_technical_specification"] = row.id in tz_map
-        item_dict["technical_specification_id"] = tz_map.get(row.id)
-
-        response_items.append(S.ContentPlanItemOut(**item_dict))
-
-    return response_items
+        item = {**defaults, **{f: row[f] for f in out_fields if f in _ITEM_COLUMNS}}
+        if with_tz:
+            tz_id = row["technical_specification_id"]
+            if "has_technical_specification" in out_fields:
+                item["has_technical_specification"] = tz_id is not None
+            if "technical_specification_id" in out_fields:
+                item["technical_specification_id"] = tz_id
+        items.append(S.ContentPlanItemOut(**item))
+    return items
 
 
 # -----------------------
@@ -337,55 +367,9 @@ async def count_content_plan(
     if project_id:
         await require_project_role(project_id, user, db, roles=("viewer", "editor", "admin"))
 
-    stmt = select(func.count(ContentPlanItem.id))
-
-    if project_id:
-        stmt = stmt.where(ContentPlanItem.project_id == project_id)
-
-    # ИСПРАВЛЕННАЯ логика фильтрации
-    if not user.is_superuser:
-        from .access import get_user_page_roles
-        user_roles = get_user_page_roles(user.id)
-        page_role = user_roles.get("content_plan", "viewer")
-
-        # Только для роли author применяем фильтрацию
-        if page_role == "author":
-            can_view_all = getattr(user, 'can_view_all_content', False)
-
-            if not can_view_all:
-                user_id_str = str(user.id)
-                stmt = stmt.where(
-                    or_(
-                        ContentPlanItem.author == user_id_str,
-                        ContentPlanItem.created_by == user.id
-                    )
-                )
-        # Admin, Editor, Viewer - видят все записи без фильтрации
-
-    # Остальные фильтры...
-    if status:
-        stmt = stmt.where(ContentPlanItem.status == status)
-    if period:
-        stmt = stmt.where(ContentPlanItem.period == period)
-    if author:
-        stmt = stmt.where(ContentPlanItem.author == author)
-    if reviewing_doctor:
-        stmt = stmt.where(ContentPlanItem.reviewing_doctor.ilike(f"%{reviewing_doctor}%"))
-    if search:
-        like = f"%{search}%"
-        stmt = stmt.where(
-            or_(
-                ContentPlanItem.topic.ilike(like),
-                ContentPlanItem.section.ilike(like),
-                ContentPlanItem.direction.ilike(like),
-                ContentPlanItem.comment.ilike(like),
-                ContentPlanItem.meta_seo.ilike(like),
-                ContentPlanItem.author.ilike(like),
-            )
-        )
-
-    total = (await db.execute(stmt)).scalar_one()
-    return S.ContentPlanCountOut(total=total)  # ИСПРАВЛЕНО: используем правильную схему
+    conds = await _list_conditions(db, user, project_id, search, status, period, author, reviewing_doctor)
+    total = (await db.execute(select(func.count()).select_from(ContentPlanItem).where(*conds))).scalar_one()
+    return S.ContentPlanCountOut(total=total)
 
 
 # -----------------------
@@ -397,13 +381,6 @@ async def create_content_plan_item(
     db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
-    import logging
-    logger = logging.getLogger(__name__)
-
-    logger.info(f"🔍 CREATE REQUEST:")
-    logger.info(f"  Current user: {user.id} ({user.email})")
-    logger.info(f"  Requested author: {getattr(data.item, 'author', 'None')}")
-
     if not data.project_ids:
         raise HTTPException(422, "project_ids is required")
 
@@ -412,64 +389,105 @@ async def create_content_plan_item(
 
     # Получаем роль пользователя для проверки прав на назначение автора
     from .access import get_user_page_roles
-    user_roles = get_user_page_roles(user.id)
+    user_roles = await get_user_page_roles(db, user.id)
     page_role = user_roles.get("content_plan", "viewer")
 
-    logger.info(f"  User page role: {page_role}")
-
-    created_rows: List[ContentPlanItem] = []
-    for pid in data.project_ids:
-        await require_project_role(pid, user, db, roles=("viewer", "editor", "admin"))
-
-        it = data.item
-        row = ContentPlanItem(
-            id=uuid.uuid4(),
-            project_id=pid,
-            version=1,
-            created_by=user.id,
-            updated_by=user.id,
-        )
-        payload = it.model_dump(exclude_unset=True)
-        _apply_str_fields(row, payload)
-
-        # ИСПРАВЛЕННАЯ ЛОГИКА НАЗНАЧЕНИЯ АВТОРА
-        requested_author = payload.get("author")
+    # роли во всех проектах — по одному снимку прав
+    await require_project_roles(data.project_ids, user, db, roles=("viewer", "editor", "admin"))
 
-        if requested_author and user.is_superuser:
-            # Суперпользователь может назначать любого автора
-            row.author = requested_author
-            logger.info(f"✅ Superuser назначил автора: {requested_author}")
-
-        elif requested_author and page_role in ("admin", "editor"):
-            # Admin и Editor могут назначать любого автора
-            row.author = requested_author
-            logger.info(f"✅ {page_role} назначил автора: {requested_author}")
-
-        elif requested_author and page_role == "author" and requested_author == str(user.id):
-            # Author может назначить только себя
-            row.author = requested_author
-            logger.info(f"✅ Author назначил себя: {requested_author}")
+    payload = data.item.model_dump(exclude_unset=True)
+    values = _item_values(payload)
+
+    # ИСПРАВЛЕННАЯ ЛОГИКА НАЗНАЧЕНИЯ АВТОРА
+    requested_author = payload.get("author")
+
+    if requested_author and user.is_superuser:
+        # Суперпользователь может назначать любого автора
+        values["author"] = requested_author
+
+    elif requested_author and page_role in ("admin", "editor"):
+        # Admin и Editor могут назначать любого автора
+        values["author"] = requested_author
+
+    elif requested_author and page_role == "author" and requested_author == str(user.id):
+        # Author может назначить только себя
+        values["author"] = requested_author
+
+    else:
+        # По умолчанию назначаем текущего пользователя
+        values["author"] = str(user.id)
+        if requested_author:
+            logger.warning(
+                "Назначение автора %s отклонено для пользователя %s (роль %s), назначен текущий пользователь",
+                requested_author, user.id, page_role,
+            )
 
-        else:
-            # По умолчанию назначаем текущего пользователя
-            row.author = str(user.id)
-            if requested_author:
-                logger.warning(f"⚠️ Запрос на назначение автора {requested_author} отклонен. Назначен текущий пользователь: {user.id}")
-            else:
-                logger.info(f"✅ Назначен текущий пользователь как автор: {user.id}")
+    # одна запись на проект — одним INSERT ... RETURNING, без refresh по строкам
+    rows = [
+        {**values, "id": uuid.uuid4(), "project_id": pid, "version": 1, "created_by": user.id, "updated_by": user.id}
+        for pid in data.project_ids
+    ]
+    created = (await db.execute(
+        insert(ContentPlanItem).values(rows).returning(*_OUT_COLUMNS)
+    )).mappings().all()
+    await db.commit()
 
-        if "doctor_review" in payload:
-            row.doctor_review = payload.get("doctor_review")
+    logger.debug("Создано записей контент-плана: %d", len(created))
+    return [S.ContentPlanItemOut(**row) for row in created]
 
-        db.add(row)
-        created_rows.append(row)
 
+# -----------------------
+# BULK UPDATE (до /{item_id}, иначе "bulk" разберётся как item_id)
+# Права — в самом WHERE: записи вне доступных проектов (и чужие для author)
+# просто не попадают под UPDATE.
+# -----------------------
+@router.patch("/bulk", response_model=S.ContentPlanBulkPatchOut)
+async def bulk_update_content_plan(
+    data: S.ContentPlanBulkPatch,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    if (data.ids is None) == (data.filter is None):
+        raise HTTPException(422, "Нужно указать либо ids, либо filter")
+    values = _item_values(data.set.model_dump(exclude_unset=True))
+    if not values:
+        raise HTTPException(422, "Нет полей для обновления")
+
+    if data.ids is not None:
+        ids = list(set(data.ids))
+        conds = [ContentPlanItem.id == any_(bindparam("ids", ids, type_=ARRAY(UUID(as_uuid=True))))]
+    else:
+        f = data.filter
+        await require_project_role(f.project_id, user, db, roles=("viewer", "editor", "admin"))
+        conds = filter_conditions(f.project_id, f.search, f.status, f.period, f.author, f.reviewing_doctor)
+
+    page_role = None
+    if not user.is_superuser:
+        await require_page_access(db, user, "content_plan", "viewer")
+        perms = await get_permissions(db, user.id)
+        page_role = perms.page_roles.get("content_plan", "viewer")
+        if page_role not in ("admin", "editor", "author"):
+            log_access(logger, "bulk_update", user, "deny", page_role)
+            raise HTTPException(403, "Нет прав на редактирование")
+
+        projects = [pid for pid, role in perms.project_roles.items() if role in ("viewer", "editor", "admin")]
+        conds.append(ContentPlanItem.project_id == any_(bindparam("projects", projects, type_=ARRAY(UUID(as_uuid=True)))))
+        # Author может редактировать только свои тексты
+        if page_role == "author":
+            conds.append(or_(ContentPlanItem.author == str(user.id), ContentPlanItem.created_by == user.id))
+    log_access(logger, "bulk_update", user, "allow", page_role, fields=",".join(values))
+
+    result = await db.execute(
+        update(ContentPlanItem)
+        .where(*conds)
+        .values(**values, version=ContentPlanItem.version + 1, updated_by=user.id)
+        .execution_options(synchronize_session=False)
+    )
     await db.commit()
-    for r in created_rows:
-        await db.refresh(r)
 
-    logger.info(f"✅ Successfully created {len(created_rows)} content plan items")
-    return created_rows
+    updated = result.rowcount
+    skipped = len(ids) - updated if data.ids is not None else 0
+    return S.ContentPlanBulkPatchOut(updated=updated, skipped=skipped)
 
 
 # -----------------------
@@ -495,9 +513,6 @@ async def update_content_plan_item(
     payload = data.item.model_dump(exclude_unset=True)
     _apply_str_fields(row, payload)
 
-    if "doctor_review" in payload:
-        row.doctor_review = payload.get("doctor_review")
-
     row.updated_by = user.id
     row.version = (row.version or 1) + 1
 
@@ -518,66 +533,102 @@ async def delete_content_plan_items(
     if not ids:
         return {"deleted": 0}
 
-    # Получаем все записи для проверки прав
-    rows = (await db.execute(
-        select(ContentPlanItem).where(ContentPlanItem.id.in_(ids))
-    )).scalars().all()
+    # Проверка прав на удаление (только Admin и Editor) — роль на странице не зависит от записи
+    await check_content_plan_delete_access(db, user)
 
-    # Проверяем права на каждую запись
-    for row in rows:
-        # Проверка прав на удаление (только Admin и Editor)
-        await check_content_plan_delete_access(db, user, row)
-        await require_project_role(row.project_id, user, db, roles=("viewer", "editor", "admin"))
+    target = ContentPlanItem.id == any_(bindparam("ids", list(set(ids)), type_=ARRAY(UUID(as_uuid=True))))
+    if not user.is_superuser:
+        # проекты затронутых записей — одним запросом, роли — по снимку прав
+        project_ids = (await db.execute(select(ContentPlanItem.project_id).where(target).distinct())).scalars().all()
+        await require_project_roles(project_ids, user, db, roles=("viewer", "editor", "admin"))
 
-    await db.execute(delete(ContentPlanItem).where(ContentPlanItem.id.in_(ids)))
+    result = await db.execute(delete(ContentPlanItem).where(target))
     await db.commit()
-    return {"deleted": len(ids)}
+    return {"deleted": result.rowcount}
 
 
 # -----------------------
 # IMPORT
 # -----------------------
+_DEDUP_FIELDS = ("topic", "period", "direction", "section")
+
+
+def _dedup_key(project_id: Optional[uuid.UUID], values: dict) -> str:
+    """То же, что генерируемая колонка dedup_key (миграция 034)."""
+    parts = [str(project_id) if project_id else "", *(values.get(f) or "" for f in _DEDUP_FIELDS)]
+    return hashlib.md5("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
 @router.post("/import", response_model=dict)
 async def import_content_plan(
     data: S.ContentPlanImportRequest,
     db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
-    # Проверка прав на импорт (только Admin и Editor)
+    # Проверка прав на импорт (только Admin и Editor) — один раз на импорт, роли — по набору проектов
     await check_content_plan_import_access(db, user)
+    await require_page_access(db, user, "content_plan", "viewer")
+    await require_project_roles({it.project_id for it in data.items}, user, db, roles=("viewer", "editor", "admin"))
 
-    created = 0
+    # ключ -> значения; повтор внутри файла — тоже дубль (берётся первое вхождение)
+    incoming: dict = {}
     for it in data.items:
-        await require_page_access(db, user, "content_plan", "viewer")
-        await require_project_role(it.project_id, user, db, roles=("viewer", "editor", "admin"))
-
-        row = ContentPlanItem(
-            id=uuid.uuid4(),
-            project_id=it.project_id,
-            version=1,
-            created_by=user.id,
-            updated_by=user.id,
+        values = _item_values(it.model_dump(exclude_unset=True))
+        incoming.setdefault(_dedup_key(it.project_id, values), (it.project_id, values))
+
+    # SELECT дублей + INSERT не атомарны, а индекс по dedup_key не уникальный:
+    # параллельные (или двойные) импорты в один проект сериализуем до commit.
+    # Порядок проектов фиксирован — чтобы два импорта не взяли блокировки крест-накрест.
+    for project_id in sorted({project_id for project_id, _ in incoming.values()}, key=str):
+        await db.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext('content_plan_import'), hashtext(:project_id))"),
+            {"project_id": str(project_id)},
         )
-        payload = it.model_dump(exclude_unset=True)
-
-
-        _apply_str_fields(row, payload)
-
-        # При импорте автор может быть задан в данных или текущий пользователь
-        author_name = payload.get("author")
-        if author_name:
-            row.author = author_name
-        else:
-            row.author = str(user.id)
 
-        if "doctor_review" in payload:
-            row.doctor_review = payload.get("doctor_review")
-
-        db.add(row)
-        created += 1
+    existing = Counter((await db.execute(
+        select(ContentPlanItem.dedup_key).where(
+            ContentPlanItem.dedup_key == any_(bindparam("keys", list(incoming), type_=ARRAY(String)))
+        )
+    )).scalars())
+
+    T = ContentPlanItem.__table__
+    rows = []
+    updates = defaultdict(list)
+    for key, (project_id, values) in incoming.items():
+        if key not in existing:
+            rows.append({
+                **dict.fromkeys(_IMPORT_COLUMNS),
+                **values,
+                "id": uuid.uuid4(),
+                "project_id": project_id,
+                # При импорте автор может быть задан в данных или текущий пользователь
+                "author": values.get("author") or str(user.id),
+                "version": 1,
+                "created_by": user.id,
+                "updated_by": user.id,
+            })
+        elif data.mode == "update":
+            # executemany требует одинакового набора полей — группируем по нему
+            fields = tuple(sorted(values))
+            updates[fields].append({"key": key, **{f"v_{f}": values[f] for f in fields}})
+
+    if rows:
+        await db.execute(insert(T), rows)
+
+    updated = 0
+    for fields, params in updates.items():
+        await db.execute(
+            update(T)
+            .where(T.c.dedup_key == bindparam("key"))
+            .values({**{f: bindparam(f"v_{f}") for f in fields}, "version": T.c.version + 1, "updated_by": user.id}),
+            params,
+        )
+        updated += sum(existing[p["key"]] for p in params)
 
     await db.commit()
-    return {"created": created, "duplicates": 0}
+    IMPORTS.labels("content_plan").inc()
+    IMPORTED_ROWS.labels("content_plan").inc(len(rows) + updated)
+    return {"created": len(rows), "duplicates": len(data.items) - len(rows), "updated": updated}
 
 
 # временный эндпоинт для отладки
@@ -599,7 +650,7 @@ async def debug_edit_access(
 
     # Получаем роль пользователя
     from .access import get_user_page_roles
-    user_roles = get_user_page_roles(user.id)
+    user_roles = await get_user_page_roles(db, user.id)
     page_role = user_roles.get("content_plan", "viewer")
 
     user_id_str = str(user.id)
@@ -652,7 +703,7 @@ async def debug_content_plan(
 
     # Получаем роль пользователя
     from .access import get_user_page_roles
-    user_roles = get_user_page_roles(user.id)
+    user_roles = await get_user_page_roles(db, user.id)
     page_role = user_roles.get("content_plan", "viewer")
 
     return {
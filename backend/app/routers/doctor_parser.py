@@ -13,7 +13,7 @@ from datetime import datetime
 
 from ..db import get_db
 from ..models import DoctorProfile, ParsingTask
-from ..services.doctor_parser import DoctorParser
+from ..metrics import PARSER_TASKS
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +44,8 @@ class TaskStatus(BaseModel):
 async def run_parsing_task(urls: List[str], task_uuid: str, batch_size: int, delay: float, proxy_list: List[str] = []):
     """Фоновая задача парсинга с прокси"""
     from ..db import SessionLocal
+    # pyppeteer / bs4 / lxml грузим только когда реально парсим — API-воркеры их не тянут
+    from ..services.doctor_parser import DoctorParser
 
     parser = DoctorParser()
     if proxy_list:
@@ -54,6 +56,7 @@ async def run_parsing_task(urls: List[str], task_uuid: str, batch_size: int, del
             await parser.parse_urls_batch(urls, db, task_uuid, batch_size, delay)
         except Exception as e:
             logger.error(f"Ошибка в фоновой задаче парсинга: {e}")
+            PARSER_TASKS.labels("failed").inc()
             # Обновляем статус задачи при ошибке
             try:
                 result = await db.execute(select(ParsingTask).where(ParsingTask.task_id == task_uuid))
@@ -85,6 +88,7 @@ async def start_parsing(
         await db.refresh(parsing_task)
 
         # Запускаем парсинг в фоне с task_id (UUID)
+        PARSER_TASKS.labels("started").inc()
         background_tasks.add_task(
             run_parsing_task,
             request.urls,
@@ -149,6 +153,7 @@ async def upload_urls(
         await db.commit()
         await db.refresh(parsing_task)
 
+        PARSER_TASKS.labels("started").inc()
         background_tasks.add_task(
             run_parsing_task,
             urls,
@@ -11,6 +11,7 @@ from app.schemas import UserWithAccessOut, UpdateUserAccessIn
 from app.db import get_db
 from app.models import Project, User, ProjectMember
 from ..deps import get_current_user, get_project_role
+from ..permissions import invalidate_permissions
 
 router = APIRouter(prefix="/projects", tags=["Projects: Members"])
 
@@ -128,6 +129,7 @@ async def add_member(
                 )
                 .values(role=payload.role)
             )
+            await invalidate_permissions(db, payload.user_id)
             await db.commit()
             return {"ok": True, "updated": True, "message": "Роль участника обновлена"}
         else:
@@ -139,6 +141,7 @@ async def add_member(
                     role=payload.role,
                 )
             )
+            await invalidate_permissions(db, payload.user_id)
             await db.commit()
             return {"ok": True, "created": True, "message": "Участник добавлен в проект"}
 
@@ -184,6 +187,7 @@ async def remove_member(
                 ProjectMember.user_id == user_id,
             )
         )
+        await invalidate_permissions(db, user_id)
         await db.commit()
 
         return {"ok": True, "deleted": True, "message": "Участник удален из проекта"}
@@ -292,6 +296,7 @@ async def update_member_access(
         from ..routers.access import update_user_pages
         await update_user_pages(user_id=user_id, payload=payload, db=db, current=current)
 
+        await invalidate_permissions(db, user_id)
         await db.commit()
         return {"ok": True, "message": "Доступ участника обновлен"}
 
@@ -342,6 +347,7 @@ async def grant_like_user(
                 )
                 inserted += 1
 
+        await invalidate_permissions(db, payload.to_user_id)
         await db.commit()
         return {"ok": True, "granted": inserted, "message": f"Скопировано прав доступа: {inserted}"}
 
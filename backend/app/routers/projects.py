@@ -11,6 +11,7 @@ from ..db import get_db
 from ..models import Project, ProjectMember, User
 from ..schemas import ProjectCreate, ProjectOut, MemberAdd, ProjectUpdate
 from ..deps import get_current_user, require_project_role
+from ..permissions import invalidate_permissions, invalidate_project_permissions
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
@@ -41,6 +42,7 @@ async def create_project(
     # ИСПРАВЛЕНО: Создателю проекта даём роль editor (не admin)
     db.add(ProjectMember(user_id=user.id, project_id=project.id, role="editor"))
 
+    await invalidate_permissions(db, user.id)
     await db.commit()
     await db.refresh(project)
     return ProjectOut.model_validate(project)
@@ -142,6 +144,8 @@ async def delete_project(
         return {"status": "archived"}
 
     # HARD DELETE
+    # участники удалятся каскадом — их снимки прав сбрасываем в той же транзакции
+    await invalidate_project_permissions(db, project_id)
     await db.execute(delete(Project).where(Project.id == project_id))
     await db.commit()
     return {"status": "deleted"}
@@ -185,6 +189,7 @@ async def add_member(
     else:
         db.add(ProjectMember(user_id=payload.user_id, project_id=project_id, role=payload.role))
 
+    await invalidate_permissions(db, payload.user_id)
     await db.commit()
     return {"ok": True}
 
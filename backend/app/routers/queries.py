@@ -13,7 +13,7 @@ from sqlalchemy.sql import literal_column
 from ..routers.access import require_page_access
 
 from ..db import get_db
-from ..models import Query, Direction, Cluster, User, Project, ProjectMember, ClusterRegistry
+from ..models import Query, Direction, Cluster, User, Project
 from ..schemas import (
     ImportRequest,
     QueryRowOut,
@@ -30,6 +30,9 @@ from ..schemas import (
     ImportItem,
 )
 from ..deps import get_current_user, require_project_role
+from ..permissions import get_permissions
+from ..metrics import EXPORTS, IMPORTS, IMPORTED_ROWS
+from ..services.cluster_registry import find_missing_clusters
 
 router = APIRouter(prefix="/queries", tags=["queries"])
 
@@ -40,15 +43,7 @@ async def _ensure_member(project_id: uuid.UUID, user, db: AsyncSession):
     """Любой участник проекта имеет доступ, либо суперюзер."""
     if getattr(user, "is_superuser", False):
         return
-    pm = (
-        await db.execute(
-            select(ProjectMember).where(
-                ProjectMember.user_id == user.id,
-                ProjectMember.project_id == project_id,
-            )
-        )
-    ).scalar_one_or_none()
-    if not pm:
+    if not (await get_permissions(db, user.id)).project_role(project_id):
         raise HTTPException(status_code=403, detail="No access to project")
 
 
@@ -95,6 +90,63 @@ def _ilike(s: str) -> str:
     return f"%{s.replace('%', '').replace('_', '')}%"
 
 
+def queries_stmt(
+    columns: tuple,
+    project_id: uuid.UUID,
+    direction: Optional[str] = None,
+    cluster: Optional[str] = None,
+    search: Optional[str] = None,
+):
+    """SELECT по запросам проекта с направлением/кластером и фильтрами ручек списка."""
+    D, C, Qr = Direction, Cluster, Query
+    stmt = (
+        select(*columns)
+        .select_from(Qr)
+        .join(D, D.id == Qr.direction_id, isouter=True)
+        .join(C, C.id == Qr.cluster_id, isouter=True)
+        .where(Qr.project_id == project_id)
+    )
+    if direction:
+        stmt = stmt.where(D.name == direction)
+    if cluster:
+        stmt = stmt.where(C.name == cluster)
+    if search:
+        stmt = stmt.where(Qr.phrase.ilike(_ilike(search)))
+    return stmt
+
+
+# Выражения ручек count / statistics / list — собираются здесь, чтобы EXPLAIN
+# в admin разбирал ровно тот же SQL
+def queries_count_stmt(project_id, direction=None, cluster=None, search=None):
+    return queries_stmt((func.count(Query.id),), project_id, direction, cluster, search)
+
+
+def queries_statistics_stmt(project_id, direction=None, cluster=None, search=None):
+    columns = (Query.id, Direction.name.label("direction"), Cluster.name.label("cluster"), Query.page, Query.tags)
+    return queries_stmt(columns, project_id, direction, cluster, search)
+
+
+def queries_list_stmt(project_id, direction=None, cluster=None, search=None, limit=50, offset=0):
+    columns = (
+        Query.id,
+        Query.phrase,
+        Query.page,
+        Query.tags,
+        Query.page_type,
+        Query.query_type,
+        Query.ws_flag,
+        Query.dt,
+        Direction.name.label("direction"),
+        Cluster.name.label("cluster"),
+    )
+    return (
+        queries_stmt(columns, project_id, direction, cluster, search)
+        .order_by(Query.updated_at.desc())
+        .limit(limit)
+        .offset(offset)
+    )
+
+
 @router.get("/count")
 async def count_queries(
     project_id: uuid.UUID = Q(...),
@@ -106,20 +158,7 @@ async def count_queries(
 ):
     await require_page_access(db, user, "clusters")
     await require_project_role(project_id, user, db, roles=("viewer","editor","admin"))
-    D, C, Qr = Direction, Cluster, Query
-    stmt = select(func.count(Qr.id)) \
-        .select_from(Qr) \
-        .join(D, D.id==Qr.direction_id, isouter=True) \
-        .join(C, C.id==Qr.cluster_id, isouter=True) \
-        .where(Qr.project_id==project_id)
-
-    if direction:
-        stmt = stmt.where(D.name==direction)
-    if cluster:
-        stmt = stmt.where(C.name==cluster)
-    if search:
-        stmt = stmt.where(Qr.phrase.ilike(_ilike(search)))
-
+    stmt = queries_count_stmt(project_id, direction, cluster, search)
     total = (await db.execute(stmt)).scalar_one()
     return {"total": int(total)}
 
@@ -136,24 +175,7 @@ async def get_queries_statistics(
     await require_page_access(db, user, "clusters")
     await require_project_role(project_id, user, db, roles=("viewer", "editor", "admin"))
 
-    D, C, Qr = Direction, Cluster, Query
-
-    # Базовый запрос с JOIN для фильтрации
-    stmt = (
-        select(Qr.id, D.name.label('direction'), C.name.label('cluster'), Qr.page, Qr.tags)
-        .select_from(Qr)
-        .join(D, D.id == Qr.direction_id, isouter=True)
-        .join(C, C.id == Qr.cluster_id, isouter=True)
-        .where(Qr.project_id == project_id)
-    )
-
-    # Применяем фильтры
-    if direction:
-        stmt = stmt.where(D.name == direction)
-    if cluster:
-        stmt = stmt.where(C.name == cluster)
-    if search:
-        stmt = stmt.where(Qr.phrase.ilike(_ilike(search)))
+    stmt = queries_statistics_stmt(project_id, direction, cluster, search)
 
     # Выполняем запрос и считаем на Python стороне
     rows = (await db.execute(stmt)).all()
@@ -259,6 +281,8 @@ async def import_queries(
     )
     await db.execute(upsert)
     await db.commit()
+    IMPORTS.labels("queries").inc()
+    IMPORTED_ROWS.labels("queries").inc(len(rows))
     return {"processed": len(rows)}
 
 
@@ -276,34 +300,7 @@ async def list_queries(
 ):
     await require_page_access(db, user, "clusters")
     await require_project_role(project_id, user, db, roles=("viewer", "editor", "admin"))
-    D, C, Qr = Direction, Cluster, Query
-    stmt = (
-        select(
-            Qr.id,
-            Qr.phrase,
-            Qr.page,
-            Qr.tags,
-            Qr.page_type,
-            Qr.query_type,
-            Qr.ws_flag,
-            Qr.dt,
-            D.name.label("direction"),
-            C.name.label("cluster"),
-        )
-        .join(D, D.id == Qr.direction_id, isouter=True)
-        .join(C, C.id == Qr.cluster_id, isouter=True)
-        .where(Qr.project_id == project_id)
-        .order_by(Qr.updated_at.desc())
-        .limit(limit)
-        .offset(offset)
-    )
-    if direction:
-        stmt = stmt.where(D.name == direction)
-    if cluster:
-        stmt = stmt.where(C.name == cluster)
-    if search:
-        stmt = stmt.where(Qr.phrase.ilike(_ilike(search)))
-
+    stmt = queries_list_stmt(project_id, direction, cluster, search, limit, offset)
     rows = (await db.execute(stmt)).all()
     return [
         QueryRowOut(
@@ -631,33 +628,22 @@ async def export_csv(
             buf.truncate(0)
 
     filename = f"export_{project_id}.csv"
+    EXPORTS.labels("queries_csv").inc()
     return StreamingResponse(_iter(), media_type="text/csv", headers={"Content-Disposition": f'attachment; filename="{filename}"'})
 
 
 # ===== import to many projects =====
-async def _missing_clusters_for_project(
-    db: AsyncSession,
-    project_id: uuid.UUID,
+def _needed_cluster_names(
     items: list[ImportItem] | list[QueryItem],
     default_cluster: str | None,
 ) -> set[str]:
-    """Вернёт множество отсутствующих в реестре кластеров для проекта."""
-    # собрать все нужные имена кластеров из items + default
+    """Все имена кластеров из items + default."""
     needed: set[str] = set()
     for it in items:
         name = (it.cluster or default_cluster or "").strip()
         if name:
             needed.add(name)
-    if not needed:
-        return set()
-
-    have = set((await db.execute(
-        select(ClusterRegistry.name).where(
-            ClusterRegistry.project_id == project_id,
-            ClusterRegistry.name.in_(list(needed))
-        )
-    )).scalars().all())
-    return needed - have
+    return needed
 
 
 async def _import_items_for_project(
@@ -849,20 +835,14 @@ async def import_multi(
         await _ensure_member(pid, user, db)
 
     # 2) Проверка реестра кластеров по каждому проекту
-    missing_by_project: dict[str, list[str]] = {}
-    allowed_project_ids: list[str] = []
-
-    for pid in payload.project_ids:
-        missing = await _missing_clusters_for_project(
-            db=db,
-            project_id=pid,
-            items=payload.items,
-            default_cluster=payload.default_cluster,
-        )
-        if missing:
-            missing_by_project[str(pid)] = sorted(missing)
-        else:
-            allowed_project_ids.append(str(pid))
+    #    (все пары проект × кластер — одним запросом)
+    missing = await find_missing_clusters(
+        db,
+        payload.project_ids,
+        _needed_cluster_names(payload.items, payload.default_cluster),
+    )
+    missing_by_project: dict[str, list[str]] = {str(pid): names for pid, names in missing.items()}
+    allowed_project_ids: list[str] = [str(pid) for pid in payload.project_ids if pid not in missing]
 
     # 3) Есть куда грузить, но не во все — 207 (Multi-Status)
     if missing_by_project and allowed_project_ids:
@@ -901,6 +881,8 @@ async def import_multi(
         inserted_or_updated += up
 
     await db.commit()
+    IMPORTS.labels("queries_multi").inc()
+    IMPORTED_ROWS.labels("queries_multi").inc(len(payload.items) * len(payload.project_ids))
     return {
         "inserted_or_updated": inserted_or_updated,
         "projects": [str(x) for x in payload.project_ids],
@@ -945,9 +927,7 @@ async def _limit_projects_visible_to_user(db: AsyncSession, user):
     if getattr(user, "is_superuser", False):
         return None
 
-    rows = await db.execute(select(ProjectMember.project_id).where(ProjectMember.user_id == user.id))
-    ids = rows.scalars().all()
-    return ids
+    return list((await get_permissions(db, user.id)).project_roles)
 
 
 @router.post("/global-delete/preview", response_model=GlobalDeletePreviewOut)
@@ -1002,17 +982,8 @@ async def global_delete_apply(
     visible = await _limit_projects_visible_to_user(db, user)
 
     if not getattr(user, "is_superuser", False):
-        allowed_ids = set(
-            (
-                await db.execute(
-                    select(ProjectMember.project_id).where(
-                        ProjectMember.user_id == user.id, ProjectMember.role.in_(("editor", "admin"))
-                    )
-                )
-            )
-            .scalars()
-            .all()
-        )
+        perms = await get_permissions(db, user.id)
+        allowed_ids = {pid for pid, role in perms.project_roles.items() if role in ("editor", "admin")}
         not_allowed = [pid for pid in body.project_ids if pid not in allowed_ids]
         if not_allowed:
             raise HTTPException(403, f"Нет прав на проекты: {', '.join(str(x) for x in not_allowed)}")
@@ -1058,20 +1029,9 @@ async def _validate_clusters_exist(
     items: list[QueryItem | ImportItem],
     default_cluster: str | None,
 ) -> None:
-    wanted: set[str] = set()
-    for it in items:
-        nm = (it.cluster or default_cluster or "").strip()
-        if nm:
-            wanted.add(nm)
-    if not wanted:
-        return
-    rows = (
-        await db.execute(
-            select(ClusterRegistry.name).where(ClusterRegistry.project_id == project_id, ClusterRegistry.name.in_(list(wanted)))
-        )
-    ).scalars().all()
-    have = set(rows)
-    missing = sorted(wanted - have)
+    missing = (
+        await find_missing_clusters(db, [project_id], _needed_cluster_names(items, default_cluster))
+    ).get(project_id)
     if missing:
         raise HTTPException(
             status_code=400,
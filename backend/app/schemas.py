@@ -160,10 +160,10 @@ class ClusterRegRowIn(BaseModel):
     name: str
     direction: Optional[str] = None
     page_type: Optional[str] = None
-    has_core: bool = False
+    has_core: bool = False       # игнорируется: считается из queries
     has_brief: bool = False
-    is_published: bool = False
-    demand: int = 0
+    is_published: bool = False   # игнорируется: считается из queries
+    demand: int = 0              # игнорируется: считается из queries
 
 class ClusterRegRowOut(BaseModel):
     id: uuid.UUID
@@ -248,6 +248,8 @@ class ContentPlanItemOut(ContentPlanItemBase):
 
 class ContentPlanImportRequest(BaseModel):
     items: List[ContentPlanItemInWithProject] = Field(..., min_items=1)
+    # дубль — та же (project_id, topic, period, direction, section): skip — пропустить, update — обновить
+    mode: str = Field("skip", pattern="^(skip|update)$")
 
 class ContentPlanListFilters(BaseModel):
     project_id: Optional[uuid.UUID] = None
@@ -261,6 +263,33 @@ class ContentPlanListFilters(BaseModel):
 class ContentPlanCountOut(BaseModel):
     total: int
 
+# PATCH /content-plan/bulk: меняются только переданные поля
+class ContentPlanBulkSet(BaseModel):
+    status: Optional[str] = None
+    reviewing_doctor: Optional[str] = None
+    doctor_approved: Optional[bool] = None
+    publish_date: Optional[dt.date] = None
+    link: Optional[str] = None
+
+class ContentPlanBulkFilter(BaseModel):
+    project_id: uuid.UUID
+    search: Optional[str] = None
+    status: Optional[str] = None
+    period: Optional[str] = None
+    author: Optional[str] = None
+    reviewing_doctor: Optional[str] = None
+
+# цель — либо ids, либо filter (по фильтрам списка в рамках проекта)
+class ContentPlanBulkPatch(BaseModel):
+    ids: Optional[List[uuid.UUID]] = Field(None, min_items=1, max_items=10000)
+    filter: Optional[ContentPlanBulkFilter] = None
+    set: ContentPlanBulkSet
+
+class ContentPlanBulkPatchOut(BaseModel):
+    updated: int
+    # ids, которых нет или на которые нет прав
+    skipped: int = 0
+
 # ---------------- Queries: мульти-импорт (ВОЗВРАТИЛИ) ----------------
 
 class ImportItem(BaseModel):
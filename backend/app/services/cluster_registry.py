@@ -0,0 +1,333 @@
+import codecs
+import csv
+import io
+import uuid
+import logging
+from typing import AsyncIterator, BinaryIO, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import text, bindparam, String, Boolean
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Поля реестра, которые выводятся из queries (их ведут триггеры, см. миграцию 028)
+DERIVED_FIELDS = ("has_core", "is_published", "demand")
+
+
+class InvalidImportFile(ValueError):
+    """Загруженный файл не читается (не XLSX, битая кодировка CSV) — текст можно показать клиенту."""
+
+_BACKFILL_SQL = """
+    UPDATE cluster_registry cr
+    SET queries_count = COALESCE(a.cnt, 0),
+        pages_count   = COALESCE(a.pages, 0),
+        demand        = COALESCE(a.ws, 0),
+        has_core      = COALESCE(a.cnt, 0) > 0,
+        is_published  = COALESCE(a.pages, 0) > 0,
+        updated_at    = now()
+    FROM cluster_registry r
+    LEFT JOIN (
+        SELECT q.project_id, c.name,
+               COUNT(*)::int AS cnt,
+               COALESCE(SUM(q.ws_flag), 0)::int AS ws,
+               (COUNT(*) FILTER (WHERE NULLIF(BTRIM(q.page), '') IS NOT NULL))::int AS pages
+        FROM queries q
+        JOIN clusters c ON c.id = q.cluster_id
+        {project_filter_q}
+        GROUP BY q.project_id, c.name
+    ) a ON a.project_id = r.project_id AND a.name = r.name
+    WHERE cr.id = r.id
+      {project_filter_r}
+      AND (cr.queries_count, cr.pages_count, cr.demand, cr.has_core, cr.is_published)
+          IS DISTINCT FROM (COALESCE(a.cnt, 0), COALESCE(a.pages, 0), COALESCE(a.ws, 0),
+                            COALESCE(a.cnt, 0) > 0, COALESCE(a.pages, 0) > 0)
+"""
+
+
+def strip_derived(values: dict) -> dict:
+    """Убирает из payload производные поля — их значение задают триггеры."""
+    return {k: v for k, v in values.items() if k not in DERIVED_FIELDS}
+
+
+async def backfill_registry_metrics(db: AsyncSession, project_id: Optional[uuid.UUID] = None) -> int:
+    """
+    Пересчитывает demand / has_core / is_published из queries одним UPDATE.
+    Нужен один раз после включения триггеров или для починки рассинхрона.
+    Возвращает число исправленных строк реестра.
+    """
+    params = {}
+    project_filter_q = project_filter_r = ""
+    if project_id is not None:
+        project_filter_q = "WHERE q.project_id = :pid"
+        project_filter_r = "AND r.project_id = :pid"
+        params["pid"] = project_id
+
+    sql = _BACKFILL_SQL.format(project_filter_q=project_filter_q, project_filter_r=project_filter_r)
+    res = await db.execute(text(sql), params)
+    fixed = res.rowcount or 0
+    logger.info("Cluster registry backfill: %s rows updated (project=%s)", fixed, project_id or "all")
+    return fixed
+
+
+_MISSING_SQL = text("""
+    SELECT p.project_id, n.name
+    FROM unnest(CAST(:project_ids AS uuid[])) AS p(project_id)
+    CROSS JOIN unnest(CAST(:names AS text[])) AS n(name)
+    WHERE NOT EXISTS (
+        SELECT 1 FROM cluster_registry cr
+        WHERE cr.project_id = p.project_id AND cr.name = n.name
+    )
+    ORDER BY p.project_id, n.name
+""").bindparams(
+    bindparam("project_ids", type_=ARRAY(UUID(as_uuid=True))),
+    bindparam("names", type_=ARRAY(String)),
+)
+
+
+async def find_missing_clusters(
+    db: AsyncSession,
+    project_ids: Iterable[uuid.UUID],
+    names: Iterable[str],
+) -> dict[uuid.UUID, list[str]]:
+    """
+    Какие кластеры отсутствуют в реестре — по всем парам (проект, имя) одним запросом.
+    Возвращает {project_id: [имена по алфавиту]} только для проектов, где чего-то нет.
+    """
+    pids = list(dict.fromkeys(project_ids))
+    wanted = sorted(set(names))
+    if not pids or not wanted:
+        return {}
+
+    res = await db.execute(_MISSING_SQL, {"project_ids": pids, "names": wanted})
+    missing: dict[uuid.UUID, list[str]] = {}
+    for pid, name in res.all():
+        missing.setdefault(pid, []).append(name)
+    return missing
+
+
+# -----------------------
+# Set-based upsert (bulk / импорт CSV / XLSX)
+# -----------------------
+
+# Строк в одном INSERT … SELECT FROM unnest(): 4 массива-параметра на любой размер пачки
+UPSERT_BATCH_SIZE = 5000
+
+_UPSERT_SQL = text("""
+    WITH src AS (
+        SELECT *
+        FROM unnest(
+            CAST(:names AS text[]),
+            CAST(:directions AS text[]),
+            CAST(:page_types AS text[]),
+            CAST(:has_briefs AS boolean[])
+        ) AS s(name, direction, page_type, has_brief)
+    ), up AS (
+        INSERT INTO cluster_registry (id, project_id, name, direction, page_type, has_brief)
+        SELECT gen_random_uuid(), :project_id, name, direction, page_type, has_brief
+        FROM src
+        ON CONFLICT (project_id, name) DO UPDATE
+        SET direction  = EXCLUDED.direction,
+            page_type  = EXCLUDED.page_type,
+            has_brief  = EXCLUDED.has_brief,
+            updated_at = now()
+        RETURNING (xmax = 0) AS inserted
+    )
+    SELECT COUNT(*) FILTER (WHERE inserted)     AS created,
+           COUNT(*) FILTER (WHERE NOT inserted) AS updated
+    FROM up
+""").bindparams(
+    bindparam("names", type_=ARRAY(String)),
+    bindparam("directions", type_=ARRAY(String)),
+    bindparam("page_types", type_=ARRAY(String)),
+    bindparam("has_briefs", type_=ARRAY(Boolean)),
+)
+
+
+async def upsert_registry_rows(db: AsyncSession, project_id: uuid.UUID, rows: Iterable[dict]) -> Tuple[int, int]:
+    """
+    Upsert пачки строк реестра одним запросом. Возвращает (created, updated),
+    посчитанные в SQL по xmax = 0. Повторы имени внутри пачки схлопываются
+    (последний побеждает) и считаются как updated. Производные поля игнорируются.
+    """
+    merged: dict[str, dict] = {}
+    total = 0
+    for row in rows:
+        merged[row["name"]] = row
+        total += 1
+    if not merged:
+        return (0, 0)
+
+    values = list(merged.values())
+    res = await db.execute(
+        _UPSERT_SQL,
+        {
+            "project_id": project_id,
+            "names": [r["name"] for r in values],
+            "directions": [r.get("direction") for r in values],
+            "page_types": [r.get("page_type") for r in values],
+            "has_briefs": [bool(r.get("has_brief")) for r in values],
+        },
+    )
+    created, updated = res.one()
+    return (created, updated + (total - len(values)))
+
+
+# -----------------------
+# Разбор файлов импорта
+# -----------------------
+
+def parse_bool(v) -> bool:
+    if isinstance(v, bool):
+        return v
+    if isinstance(v, (int, float)):
+        # ячейки XLSX приходят числами
+        return v != 0
+    s = (str(v) if v is not None else "").strip().lower()
+    return s in {"1", "true", "t", "yes", "y", "да", "истина", "on", "+"}
+
+
+def _clean(v) -> Optional[str]:
+    if v is None:
+        return None
+    s = str(v).strip()
+    return s or None
+
+
+def registry_row_from_record(record: dict, line_no: int) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Строка файла (заголовки как в выгрузке реестра) -> строка для upsert.
+    «Ядро», «Размещено», «Спрос» не импортируются — считаются из queries.
+    """
+    name = _clean(record.get("Кластер") or record.get("кластер"))
+    if not name:
+        return None, f"Строка {line_no}: пустое поле «Кластер»"
+    return {
+        "name": name,
+        "direction": _clean(record.get("Направление") or record.get("направление")),
+        "page_type": _clean(record.get("Тип страницы") or record.get("тип страницы")),
+        "has_brief": parse_bool(record.get("ТЗ")),
+    }, None
+
+
+def _detect_csv_encoding(fh: BinaryIO, probe_size: int = 64 * 1024) -> str:
+    """utf-8 (с BOM или без) или cp1251 — по первым probe_size байтам."""
+    head = fh.read(probe_size)
+    fh.seek(0)
+    try:
+        # final=False: обрезанный на границе многобайтный символ не считается ошибкой
+        codecs.getincrementaldecoder("utf-8-sig")().decode(head, final=False)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "cp1251"
+
+
+def iter_csv_batches(fh: BinaryIO, batch_size: int = UPSERT_BATCH_SIZE) -> Iterator[Tuple[List[dict], List[str]]]:
+    """
+    Потоково читает CSV из файла загрузки и отдаёт пачки (rows, errors).
+
+    Кодировка угадывается по началу файла; если дальше встретится байт, который
+    в ней не декодируется, поднимается InvalidImportFile с номером последней
+    прочитанной строки — роутер отвечает 400, а не 500.
+    """
+    encoding = _detect_csv_encoding(fh)
+    stream = io.TextIOWrapper(fh, encoding=encoding, newline="")
+    reader = csv.DictReader(stream, delimiter=",")
+    try:
+        rows: List[dict] = []
+        errors: List[str] = []
+        for line_no, record in enumerate(reader, start=2):
+            row, err = registry_row_from_record(record, line_no)
+            if err:
+                errors.append(err)
+            else:
+                rows.append(row)
+            if len(rows) >= batch_size:
+                yield rows, errors
+                rows, errors = [], []
+        if rows or errors:
+            yield rows, errors
+    except UnicodeDecodeError as e:
+        # TextIOWrapper декодирует блоками, поэтому точна только граница:
+        # всё до строки reader.line_num прочитано без ошибок
+        raise InvalidImportFile(
+            f"Не удалось прочитать CSV в кодировке {encoding} после строки {reader.line_num}: "
+            f"недопустимый байт 0x{e.object[e.start]:02x}. Сохраните файл в UTF-8"
+        ) from e
+    finally:
+        # файл закрывает UploadFile, обёртку просто отцепляем
+        stream.detach()
+
+
+def iter_xlsx_batches(fh: BinaryIO, batch_size: int = UPSERT_BATCH_SIZE) -> Iterator[Tuple[List[dict], List[str]]]:
+    """
+    Потоково читает первый лист XLSX (openpyxl read_only — строки не держатся
+    в памяти целиком) и отдаёт пачки (rows, errors). Первая строка — заголовки.
+    """
+    import zipfile
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        wb = load_workbook(fh, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+        raise InvalidImportFile("Файл не является книгой XLSX") from e
+    try:
+        ws = wb.worksheets[0]
+        it = ws.iter_rows(values_only=True)
+        header = next(it, None)
+        if header is None:
+            return
+        keys = [(str(h).strip() if h is not None else "") for h in header]
+
+        rows: List[dict] = []
+        errors: List[str] = []
+        for line_no, values in enumerate(it, start=2):
+            if values is None or all(v is None or str(v).strip() == "" for v in values):
+                continue
+            row, err = registry_row_from_record(dict(zip(keys, values)), line_no)
+            if err:
+                errors.append(err)
+            else:
+                rows.append(row)
+            if len(rows) >= batch_size:
+                yield rows, errors
+                rows, errors = [], []
+        if rows or errors:
+            yield rows, errors
+    finally:
+        wb.close()
+
+
+async def iterate_in_threadpool(batches: Iterator) -> AsyncIterator:
+    """Каждую следующую пачку разбираем в пуле потоков, чтобы не блокировать event loop."""
+    done = object()
+    while True:
+        batch = await run_in_threadpool(next, batches, done)
+        if batch is done:
+            return
+        yield batch
+
+
+async def import_registry_batches(
+    db: AsyncSession,
+    project_id: uuid.UUID,
+    batches: Iterator[Tuple[List[dict], List[str]]],
+) -> dict:
+    """Общий хвост импорта CSV/XLSX: пачки -> set-based upsert, итоговые счётчики."""
+    processed = created = updated = 0
+    errors: List[str] = []
+    async for rows, batch_errors in iterate_in_threadpool(batches):
+        errors.extend(batch_errors)
+        if rows:
+            c, u = await upsert_registry_rows(db, project_id, rows)
+            created += c
+            updated += u
+            processed += len(rows)
+    return {
+        "processed": processed,
+        "created": created,
+        "updated": updated,
+        "errors": errors,
+    }
@@ -12,6 +12,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from ..models import DoctorProfile, ParsingTask
 from ..config import settings
+from ..metrics import PARSER_TASKS
 
 logger = logging.getLogger(__name__)
 
@@ -731,6 +732,7 @@ class DoctorParser:
                     final_task.completed_at = datetime.utcnow()
                     final_task.processed_profiles = completed
                     await db.commit()
+                    PARSER_TASKS.labels("completed").inc()
 
                     logger.info(f"🎉 Парсинг завершен! Обработано: {completed}/{total_urls}, Успешных: {successful}")
                 else:
@@ -742,6 +744,7 @@ class DoctorParser:
 
         except Exception as e:
             logger.error(f"💀 Критическая ошибка при пакетном парсинге: {e}")
+            PARSER_TASKS.labels("failed").inc()
 
             try:
                 # Обновляем статус на ошибку
@@ -0,0 +1,18 @@
+"""
+Мелкие помощники для построения SQL.
+"""
+from sqlalchemy.sql import ColumnElement
+
+# символ экранирования для шаблонов LIKE/ILIKE, собранных like_contains
+LIKE_ESCAPE = "\\"
+
+
+def like_contains(s: str) -> str:
+    """Подстрока для ILIKE ... ESCAPE '\\': %, _ и \\ из пользовательского ввода ищутся буквально."""
+    s = s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{s}%"
+
+
+def ilike_contains(column, s: str) -> ColumnElement[bool]:
+    """column ILIKE '%s%' с экранированием — для поиска по подстроке."""
+    return column.ilike(like_contains(s), escape=LIKE_ESCAPE)
@@ -0,0 +1,35 @@
+"""
+Разовый пересчёт производных метрик реестра кластеров из queries.
+
+    python -m app.tools.backfill_registry                 # все проекты
+    python -m app.tools.backfill_registry --project-id …  # один проект
+"""
+import argparse
+import asyncio
+import logging
+import uuid
+
+from ..db import SessionLocal, close_db_connections
+from ..services.cluster_registry import backfill_registry_metrics
+
+
+async def _run(project_id: uuid.UUID | None) -> int:
+    async with SessionLocal() as db:
+        fixed = await backfill_registry_metrics(db, project_id)
+        await db.commit()
+    await close_db_connections()
+    return fixed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Пересчёт demand / has_core / is_published в cluster_registry")
+    parser.add_argument("--project-id", type=uuid.UUID, default=None, help="Только для одного проекта")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    fixed = asyncio.run(_run(args.project_id))
+    print(f"✅ Обновлено строк реестра: {fixed}")
+
+
+if __name__ == "__main__":
+    main()
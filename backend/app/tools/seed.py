@@ -0,0 +1,475 @@
+"""
+Генератор синтетических данных продакшн-масштаба.
+
+Проекты с направлениями, кластерами, реестром, запросами (русские фразы,
+ws_flag по Ципфу, теги, страницы, даты), контент-план с ТЗ и задачи парсера
+с профилями врачей. Всё грузится через COPY (asyncpg) пачками; при одном и
+том же --seed данные совпадают до байта (кроме времени создания). Даты запросов
+и периоды контент-плана отсчитываются от --today (по умолчанию REFERENCE_DATE),
+а не от текущего дня — форма данных для бенчмарков не плывёт со временем.
+
+    python -m app.tools.seed --projects 2 --queries 1000000 --content-plan 50000
+    python -m app.tools.seed --queries 10000 --parser-tasks 5 --profiles-per-task 200 --seed 7
+"""
+import argparse
+import asyncio
+import bisect
+import itertools
+import json
+import logging
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Iterator, List, Sequence
+
+from sqlalchemy import select
+
+from ..db import SessionLocal, close_db_connections, engine
+from ..models import PageAccess, PageRole, User
+
+logger = logging.getLogger(__name__)
+
+COPY_BATCH = 50_000
+
+# ---------------- Словари ----------------
+# Фраза = процедура + объект + уточнение + гео + аудитория. Наборы слов не
+# пересекаются, поэтому разные комбинации дают разные строки.
+PROCEDURES = [
+    "лечение", "удаление", "диагностика", "консультация", "операция", "анализ", "узи", "мрт",
+    "кт", "рентген", "массаж", "терапия", "протезирование", "имплантация", "чистка", "пломбирование",
+    "обследование", "вакцинация", "лазерная коррекция", "эндоскопия", "пункция", "биопсия",
+    "физиотерапия", "реабилитация", "шунтирование", "склеротерапия", "санация", "дренирование",
+    "коррекция", "пластика",
+]
+OBJECTS = [
+    "зуба", "кариеса", "десен", "желудка", "щитовидной железы", "позвоночника", "суставов",
+    "коленного сустава", "сердца", "почек", "печени", "глаз", "кожи", "вен", "сосудов",
+    "молочной железы", "простаты", "носа", "уха", "горла", "мениска", "грыжи", "кисты",
+    "полипов", "миомы", "геморроя", "варикоза", "катаракты", "глаукомы", "сколиоза",
+]
+MODIFIERS = [
+    "", "цена", "стоимость", "отзывы", "платно", "недорого", "срочно", "в клинике", "записаться",
+    "лучший врач", "круглосуточно", "без боли", "под наркозом", "по полису омс", "рядом", "адреса",
+    "сколько стоит", "последствия", "противопоказания", "как проходит", "подготовка", "результаты",
+    "восстановление", "показания", "осложнения", "фото до и после", "видео", "онлайн",
+    "в выходные", "бесплатно",
+]
+GEO = [
+    "", "москва", "спб", "в москве", "в санкт-петербурге", "казань", "екатеринбург", "новосибирск",
+    "нижний новгород", "краснодар", "самара", "ростов-на-дону", "уфа", "пермь", "воронеж",
+    "м. динамо", "м. сокол", "на юго-западе", "в центре", "в химках", "мытищи", "подольск",
+    "балашиха", "зеленоград", "тверь", "тула", "ярославль", "челябинск", "омск", "сочи",
+]
+AUDIENCE = [
+    "", "взрослым", "ребенку", "детям", "пожилым", "беременным", "при диабете", "после травмы",
+    "хронического", "острого", "у мужчин", "у женщин", "у подростков", "у спортсменов",
+    "у пенсионеров", "2024", "2025",
+]
+
+DIRECTION_NAMES = [
+    "Стоматология", "Гастроэнтерология", "Эндокринология", "Неврология", "Ортопедия", "Кардиология",
+    "Урология", "Гепатология", "Офтальмология", "Дерматология", "Флебология", "Маммология",
+    "Оториноларингология", "Хирургия", "Гинекология", "Проктология",
+]
+PAGE_TYPES = ["услуга", "статья", "врач", "цена", "акция"]
+QUERY_TYPES = ["коммерческий", "информационный", "навигационный"]
+TAGS = ["приоритет", "сезон", "акция", "новое", "ВЧ", "СЧ", "НЧ", "бренд", "конкурент", "гео"]
+
+STATUSES = ["В работе", "На проверке", "У врача", "Готово", "размещено"]
+STATUS_WEIGHTS = [30, 15, 10, 15, 30]
+SECTIONS = ["Блог", "Услуги", "Врачи", "Вопрос-ответ", "Новости"]
+TOPIC_TEMPLATES = [
+    "Как проходит {p} {o}", "{P} {o}: показания и противопоказания", "Сколько стоит {p} {o}",
+    "{P} {o} у детей", "Восстановление после: {p} {o}", "Мифы о теме «{p} {o}»",
+]
+
+FIRST_NAMES = ["Александр", "Сергей", "Андрей", "Дмитрий", "Елена", "Ольга", "Наталья", "Ирина",
+               "Татьяна", "Михаил", "Анна", "Мария", "Алексей", "Юлия", "Владимир", "Светлана"]
+LAST_NAMES = ["Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов", "Михайлов",
+              "Новиков", "Фёдоров", "Морозов", "Волков", "Алексеев", "Лебедев", "Семёнов", "Егоров"]
+PATRONYMICS = ["Александрович", "Сергеевич", "Андреевич", "Дмитриевич", "Игоревич", "Олегович"]
+SPECIALIZATIONS = ["Стоматолог", "Гастроэнтеролог", "Эндокринолог", "Невролог", "Ортопед", "Кардиолог",
+                   "Уролог", "Офтальмолог", "Дерматолог", "Флеболог", "Хирург", "Гинеколог", "ЛОР"]
+CLINICS = ["Клиника «Здоровье»", "Медцентр «Парацельс»", "СМ-Клиника", "Клиника «Семейная»",
+           "МЦ «Медлайн»", "Городская поликлиника №3", "Клиника «Пирогов»"]
+PARSER_STATUSES = ["completed", "completed", "completed", "failed", "running", "pending"]
+
+
+# ---------------- Детерминированные примитивы ----------------
+def _uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+class _Zipf:
+    """Выборка k ∈ [1, n] с P(k) ∝ 1 / k^s — частотность поисковых фраз."""
+
+    def __init__(self, n: int = 100_000, s: float = 1.1):
+        self.cum = list(itertools.accumulate(1.0 / k ** s for k in range(1, n + 1)))
+
+    def sample(self, rng: random.Random) -> int:
+        return bisect.bisect_left(self.cum, rng.random() * self.cum[-1]) + 1
+
+
+_SLOTS = (PROCEDURES, OBJECTS, MODIFIERS, GEO, AUDIENCE)
+PHRASE_SPACE = 1
+for _slot in _SLOTS:
+    PHRASE_SPACE *= len(_slot)
+
+
+def _coprime_step(n: int, rng: random.Random) -> int:
+    while True:
+        step = rng.randrange(n // 3, n)
+        if math.gcd(step, n) == 1:
+            return step
+
+
+def phrase_parts(i: int, step: int, offset: int) -> tuple:
+    """i-я фраза проекта: биекция i -> (i * step + offset) mod N, разложенная по словарям."""
+    j = (i * step + offset) % PHRASE_SPACE
+    parts = []
+    for slot in _SLOTS:
+        j, r = divmod(j, len(slot))
+        parts.append(slot[r])
+    return tuple(parts)
+
+
+def _phrase(parts: tuple) -> str:
+    return " ".join(p for p in parts if p)
+
+
+def _person(rng: random.Random) -> str:
+    return f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)} {rng.choice(PATRONYMICS)}"
+
+
+def _reviews_count(rng: random.Random) -> int:
+    # длинный хвост без таблицы весов: Парето
+    return int(rng.paretovariate(1.2)) - 1
+
+
+# ---------------- COPY ----------------
+async def _copy(conn, table: str, columns: Sequence[str], records: Iterable[tuple]) -> int:
+    """
+    COPY пачками по COPY_BATCH — генератор не держит в памяти всю таблицу.
+    Следующая пачка генерируется в потоке, пока сервер принимает текущую.
+    """
+    it = iter(records)
+
+    def take() -> list:
+        return list(itertools.islice(it, COPY_BATCH))
+
+    total = 0
+    batch = await asyncio.to_thread(take)
+    while batch:
+        pending = asyncio.ensure_future(asyncio.to_thread(take))
+        try:
+            await conn.copy_records_to_table(table, records=batch, columns=list(columns))
+        except BaseException:
+            pending.cancel()
+            raise
+        total += len(batch)
+        batch = await pending
+    return total
+
+
+# опорная «сегодняшняя» дата для dt запросов и периодов контент-плана
+REFERENCE_DATE = date(2026, 1, 1)
+
+
+@dataclass
+class SeedOptions:
+    queries: int = 10_000
+    content_plan: int = 1_000
+    tz_ratio: float = 0.3
+    registry_extra_ratio: float = 0.5
+    seed: int = 42
+    today: date = REFERENCE_DATE
+
+
+@dataclass
+class ProjectSeed:
+    project_id: uuid.UUID
+    name: str
+    counts: dict
+
+
+async def seed_project(conn, rng: random.Random, name: str, owner_id: uuid.UUID, opts: SeedOptions) -> ProjectSeed:
+    """Один проект со всеми зависимыми строками. conn — asyncpg-соединение внутри транзакции."""
+    if opts.queries > PHRASE_SPACE:
+        raise ValueError(f"Слишком много запросов на проект: максимум {PHRASE_SPACE}")
+
+    now = datetime.now(timezone.utc)
+    pid = _uuid(rng)
+    counts: dict = {}
+    await conn.execute(
+        "INSERT INTO projects (id, name, created_by, updated_by) VALUES ($1, $2, $3, $3)", pid, name, owner_id
+    )
+    await conn.execute(
+        "INSERT INTO project_members (user_id, project_id, role) VALUES ($1, $2, 'admin')", owner_id, pid
+    )
+
+    # направление — по объекту (группе органов), кластер — «процедура + объект»
+    directions = {d: _uuid(rng) for d in DIRECTION_NAMES}
+    obj_direction = {o: DIRECTION_NAMES[i % len(DIRECTION_NAMES)] for i, o in enumerate(OBJECTS)}
+    clusters = {(p, o): _uuid(rng) for p in PROCEDURES for o in OBJECTS}
+    counts["directions"] = await _copy(
+        conn, "directions", ("id", "project_id", "name"), ((i, pid, n) for n, i in directions.items())
+    )
+    counts["clusters"] = await _copy(
+        conn, "clusters", ("id", "project_id", "name"), ((i, pid, f"{p} {o}") for (p, o), i in clusters.items())
+    )
+
+    # реестр: все кластеры с запросами + запланированные (гео-варианты без запросов)
+    def registry_rows() -> Iterator[tuple]:
+        for p, o in clusters:
+            yield (_uuid(rng), pid, f"{p} {o}", obj_direction[o], rng.choice(PAGE_TYPES), rng.random() < 0.3)
+        extra = int(len(clusters) * opts.registry_extra_ratio)
+        for k in range(extra):
+            p, o = PROCEDURES[k % len(PROCEDURES)], OBJECTS[(k // len(PROCEDURES)) % len(OBJECTS)]
+            geo = GEO[1 + (k // (len(PROCEDURES) * len(OBJECTS))) % (len(GEO) - 1)]
+            yield (_uuid(rng), pid, f"{p} {o} {geo}", obj_direction[o], rng.choice(PAGE_TYPES), False)
+
+    counts["registry"] = await _copy(
+        conn, "cluster_registry", ("id", "project_id", "name", "direction", "page_type", "has_brief"),
+        registry_rows(),
+    )
+
+    zipf = _Zipf()
+    step, offset = _coprime_step(PHRASE_SPACE, rng), rng.randrange(PHRASE_SPACE)
+    day0 = opts.today - timedelta(days=730)
+
+    def query_rows() -> Iterator[tuple]:
+        for i in range(opts.queries):
+            parts = phrase_parts(i, step, offset)
+            proc, obj = parts[0], parts[1]
+            has_page = rng.random() < 0.35
+            ntags = rng.choices((0, 1, 2, 3), weights=(55, 30, 10, 5))[0]
+            created = now - timedelta(seconds=rng.randrange(730 * 86400))
+            yield (
+                _uuid(rng), pid, directions[obj_direction[obj]], clusters[(proc, obj)], _phrase(parts),
+                f"/uslugi/{PROCEDURES.index(proc)}-{OBJECTS.index(obj)}" if has_page else None,
+                rng.sample(TAGS, ntags),
+                rng.choice(PAGE_TYPES), rng.choice(QUERY_TYPES),
+                zipf.sample(rng),
+                day0 + timedelta(days=rng.randrange(730)) if has_page and rng.random() < 0.6 else None,
+                1, owner_id, owner_id, created, created,
+            )
+
+    counts["queries"] = await _copy(
+        conn, "queries",
+        ("id", "project_id", "direction_id", "cluster_id", "phrase", "page", "tags", "page_type",
+         "query_type", "ws_flag", "dt", "version", "created_by", "updated_by", "created_at", "updated_at"),
+        query_rows(),
+    )
+
+    # контент-план и ТЗ к части записей
+    tz_rows: List[tuple] = []
+    month0 = date(opts.today.year - 1, 1, 1)
+
+    def content_plan_rows() -> Iterator[tuple]:
+        for i in range(opts.content_plan):
+            item_id = _uuid(rng)
+            proc, obj = rng.choice(PROCEDURES), rng.choice(OBJECTS)
+            topic = rng.choice(TOPIC_TEMPLATES).format(p=proc, P=proc.capitalize(), o=obj)
+            status = rng.choices(STATUSES, weights=STATUS_WEIGHTS)[0]
+            published = status == "размещено"
+            m = month0.month - 1 + i % 24
+            period = f"{month0.year + m // 12}-{m % 12 + 1:02d}"
+            has_tz = rng.random() < opts.tz_ratio
+            created = now - timedelta(seconds=rng.randrange(365 * 86400))
+            yield (
+                item_id, pid, period, rng.choice(SECTIONS), obj_direction[obj], topic,
+                f"https://docs.example.com/tz/{item_id.hex[:12]}" if has_tz else None,
+                rng.choice((3000, 5000, 7000, 10000)), status, _person(rng),
+                f"https://docs.example.com/text/{item_id.hex[:12]}" if status != "В работе" else None,
+                _person(rng) if status in ("У врача", "Готово", "размещено") else None,
+                status in ("Готово", "размещено"),
+                f"https://clinic.example.com/blog/{item_id.hex[:12]}" if published else None,
+                (created + timedelta(days=rng.randrange(1, 60))).date() if published else None,
+                1, owner_id, owner_id, created, created,
+            )
+            if has_tz:
+                keywords = [_phrase(phrase_parts(rng.randrange(PHRASE_SPACE), 1, 0)) for _ in range(rng.randint(3, 8))]
+                tz_rows.append((
+                    _uuid(rng), item_id, topic, _person(rng),
+                    json.dumps([{"title": t, "text": ""} for t in ("Введение", "Показания", "Как проходит", "Цены")],
+                               ensure_ascii=False),
+                    json.dumps(keywords, ensure_ascii=False),
+                    json.dumps(rng.sample(MODIFIERS[1:], 4), ensure_ascii=False),
+                    json.dumps([f"https://competitor{n}.example.com/" for n in range(rng.randint(1, 4))]),
+                    rng.choice((3000, 5000, 7000)), "В точном и разбавленном вхождении",
+                    owner_id, owner_id,
+                ))
+
+    counts["content_plan"] = await _copy(
+        conn, "content_plan_items",
+        ("id", "project_id", "period", "section", "direction", "topic", "tz", "chars", "status", "author",
+         "review", "reviewing_doctor", "doctor_approved", "link", "publish_date",
+         "version", "created_by", "updated_by", "created_at", "updated_at"),
+        content_plan_rows(),
+    )
+    counts["tz"] = await _copy(
+        conn, "technical_specifications",
+        ("id", "content_plan_id", "title", "author", "blocks", "keywords", "lsi_phrases", "competitors",
+         "count", "usage_form", "created_by", "updated_by"),
+        tz_rows,
+    )
+    return ProjectSeed(project_id=pid, name=name, counts=counts)
+
+
+async def seed_parser(conn, rng: random.Random, tasks: int, profiles_per_task: int, replace: bool = False) -> dict:
+    now = datetime.utcnow()  # колонки парсера — timestamp without time zone
+    task_rows, profile_rows = [], []
+    for _ in range(tasks):
+        task_id = _uuid(rng)
+        status = rng.choice(PARSER_STATUSES)
+        created = now - timedelta(hours=rng.randrange(24 * 90))
+        processed = profiles_per_task if status == "completed" else rng.randrange(profiles_per_task + 1)
+        task_rows.append((
+            task_id, status, profiles_per_task, processed, created,
+            created + timedelta(minutes=rng.randint(5, 120)) if status in ("completed", "failed") else None,
+            "Timeout while fetching profile" if status == "failed" else None,
+        ))
+        for n in range(processed):
+            city = rng.choice(GEO[4:14])
+            profile_rows.append((
+                task_id, _person(rng), rng.choice(SPECIALIZATIONS), f"{rng.randint(1, 40)} лет",
+                "Первый МГМУ им. И.М. Сеченова", rng.choice(CLINICS), f"{rng.uniform(3.5, 5.0):.1f}",
+                str(_reviews_count(rng)), f"+7 (9{rng.randint(10, 99)}) {rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(10, 99)}",
+                f"{city}, ул. {rng.choice(LAST_NAMES)}а, д. {rng.randint(1, 120)}",
+                f"https://prodoctorov.example.com/doctor/{task_id.hex[:8]}-{n}",
+                created + timedelta(seconds=n),
+            ))
+    task_ids = [r[0] for r in task_rows]
+    if await conn.fetchval("SELECT count(*) FROM parsing_tasks WHERE task_id = ANY($1::uuid[])", task_ids):
+        if not replace:
+            logger.info("Задачи парсера с этим seed уже есть — пропускаем (--replace пересоздаст)")
+            return {}
+        await conn.execute("DELETE FROM doctor_profiles WHERE task_id = ANY($1::uuid[])", task_ids)
+        await conn.execute("DELETE FROM parsing_tasks WHERE task_id = ANY($1::uuid[])", task_ids)
+
+    counts = {
+        "parser_tasks": await _copy(
+            conn, "parsing_tasks",
+            ("task_id", "status", "total_profiles", "processed_profiles", "created_at", "completed_at", "error_message"),
+            task_rows,
+        ),
+    }
+    counts["doctor_profiles"] = await _copy(
+        conn, "doctor_profiles",
+        ("task_id", "name", "specialization", "experience", "education", "workplace", "rating",
+         "reviews_count", "phone", "address", "profile_url", "parsing_date"),
+        profile_rows,
+    )
+    return counts
+
+
+async def ensure_owner(email: str) -> uuid.UUID:
+    """Владелец сгенерированных проектов: обычный пользователь с доступом к страницам."""
+    async with SessionLocal() as db:
+        user_id = (await db.execute(select(User.id).where(User.email == email))).scalar_one_or_none()
+        if user_id is None:
+            user_id = uuid.uuid4()
+            db.add(User(id=user_id, email=email, name="Seed", is_active=True, is_superuser=False))
+            await db.flush()
+            for page in ("clusters", "content_plan"):
+                db.add(PageAccess(user_id=user_id, page=page))
+                db.add(PageRole(user_id=user_id, page=page, role="editor"))
+            await db.commit()
+    return user_id
+
+
+async def seed(
+    projects: int,
+    opts: SeedOptions,
+    owner_email: str = "seed@example.com",
+    prefix: str = "seed",
+    parser_tasks: int = 0,
+    profiles_per_task: int = 0,
+    replace: bool = False,
+) -> List[ProjectSeed]:
+    """
+    Генерация целиком; одна транзакция — при ошибке ничего не остаётся.
+
+    Генератор каждого проекта инициализируется от (seed, имя проекта), поэтому
+    проект с тем же именем получается тем же самым: уже существующий
+    пропускается (counts пустой), с replace=True — пересоздаётся.
+    """
+    owner_id = await ensure_owner(owner_email)
+    result: List[ProjectSeed] = []
+    async with engine.connect() as sa_conn:
+        raw = await sa_conn.get_raw_connection()
+        conn = raw.driver_connection
+        async with conn.transaction():
+            for n in range(projects):
+                name = f"{prefix}-{opts.queries}-{n + 1}"
+                existing = await conn.fetchval("SELECT id FROM projects WHERE name = $1", name)
+                if existing is not None:
+                    if not replace:
+                        logger.info("%s уже есть — пропускаем (--replace пересоздаст)", name)
+                        result.append(ProjectSeed(project_id=existing, name=name, counts={}))
+                        continue
+                    await conn.execute("DELETE FROM project_members WHERE project_id = $1", existing)
+                    await conn.execute("DELETE FROM projects WHERE id = $1", existing)
+
+                t0 = time.perf_counter()
+                ps = await seed_project(conn, random.Random(f"{opts.seed}:{name}"), name, owner_id, opts)
+                rows = sum(ps.counts.values())
+                logger.info("%s: %s (%.0f строк/с)", ps.name, ps.counts, rows / (time.perf_counter() - t0))
+                result.append(ps)
+            if parser_tasks:
+                rng = random.Random(f"{opts.seed}:{prefix}:parser")
+                logger.info("parser: %s", await seed_parser(conn, rng, parser_tasks, profiles_per_task, replace))
+        for table in ("queries", "cluster_registry", "content_plan_items", "technical_specifications"):
+            await conn.execute(f"ANALYZE {table}")
+    return result
+
+
+async def _run(args) -> List[ProjectSeed]:
+    opts = SeedOptions(
+        queries=args.queries,
+        content_plan=args.content_plan,
+        tz_ratio=args.tz_ratio,
+        registry_extra_ratio=args.registry_extra,
+        seed=args.seed,
+        today=args.today,
+    )
+    try:
+        return await seed(
+            args.projects, opts, args.owner_email, args.prefix, args.parser_tasks, args.profiles_per_task, args.replace
+        )
+    finally:
+        await close_db_connections()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Синтетические данные: проекты, запросы, реестр, контент-план, парсер")
+    parser.add_argument("--projects", type=int, default=1)
+    parser.add_argument("--queries", type=int, default=10_000, help="Запросов на проект")
+    parser.add_argument("--content-plan", type=int, default=1_000, help="Записей контент-плана на проект")
+    parser.add_argument("--tz-ratio", type=float, default=0.3, help="Доля записей контент-плана с ТЗ")
+    parser.add_argument("--registry-extra", type=float, default=0.5,
+                        help="Запланированные строки реестра без запросов (доля от числа кластеров)")
+    parser.add_argument("--parser-tasks", type=int, default=0)
+    parser.add_argument("--profiles-per-task", type=int, default=100)
+    parser.add_argument("--owner-email", default="seed@example.com")
+    parser.add_argument("--prefix", default="seed", help="Префикс имён проектов")
+    parser.add_argument("--seed", type=int, default=42, help="Seed генератора — те же данные при повторе")
+    parser.add_argument("--today", type=date.fromisoformat, default=REFERENCE_DATE,
+                        help="Опорная дата (YYYY-MM-DD) для дат запросов и периодов контент-плана")
+    parser.add_argument("--replace", action="store_true", help="Пересоздать уже существующие проекты с теми же именами")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    t0 = time.perf_counter()
+    projects = asyncio.run(_run(args))
+    total = sum(sum(p.counts.values()) for p in projects)
+    for p in projects:
+        print(f"✅ {p.name} ({p.project_id}): {p.counts}")
+    print(f"Всего строк: {total} за {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
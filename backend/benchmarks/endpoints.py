@@ -0,0 +1,228 @@
+"""
+Бенчмарк основных эндпоинтов на проектах 10k / 100k / 1M запросов.
+
+Поднимает приложение in-process (httpx + ASGITransport) на базе из DATABASE_URL,
+готовит проект каждого размера генератором app.tools.seed (queries, реестр, контент-план
+с ТЗ; уже посеянный проект переиспользуется, --reseed пересоздаёт) и для каждого
+эндпоинта меряет p50/p95 задержки и пропускную способность.
+
+Результат пишется в JSON (--out). Если есть файл базовой линии (--baseline),
+p95 сравнивается с ним: рост больше чем на --max-regression (доля) и
+--min-delta-ms одновременно — регрессия, код возврата 1.
+
+    cd backend && python -m benchmarks.endpoints --sizes 10000,100000
+    cd backend && python -m benchmarks.endpoints --sizes 10000 --save-baseline
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+BENCH_EMAIL = "bench-endpoints@example.com"
+CONTENT_PLAN_RATIO = 10      # строк контент-плана: size / CONTENT_PLAN_RATIO
+CONTENT_PLAN_MAX = 100_000
+IMPORT_BATCH = 1000
+BULK_BATCH = 100
+BULK_SLICES = 64
+
+
+def _pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+# ---------------- Подготовка данных ----------------
+async def _ensure_projects(sizes: list[int], reseed: bool) -> dict[int, uuid.UUID]:
+    """Проекты bench-<size>-1 генератором app.tools.seed; уже посеянные переиспользуются."""
+    from app.tools.seed import SeedOptions, seed
+
+    projects = {}
+    for size in sizes:
+        t0 = time.perf_counter()
+        opts = SeedOptions(queries=size, content_plan=min(CONTENT_PLAN_MAX, max(1, size // CONTENT_PLAN_RATIO)))
+        [ps] = await seed(1, opts, owner_email=BENCH_EMAIL, prefix="bench", replace=reseed)
+        if ps.counts:
+            print(f"  seeded {ps.name} in {time.perf_counter() - t0:.1f}s")
+        projects[size] = ps.project_id
+    return projects
+
+
+# ---------------- Замеры ----------------
+def _cases(pid: uuid.UUID, sample_ids: list[str]):
+    """(имя, метод, путь, тело) — по одному на эндпоинт; тело может быть функцией от номера запроса."""
+    p = str(pid)
+    import_items = [
+        {"phrase": f"бенч импорт {i}", "direction": "Бенч импорт", "ws_flag": i} for i in range(IMPORT_BATCH)
+    ]
+    return [
+        ("queries.list", "GET", f"/queries?project_id={p}&limit=50", None),
+        ("queries.list_search", "GET", f"/queries?project_id={p}&limit=50&search=лечение кариеса", None),
+        ("queries.count", "GET", f"/queries/count?project_id={p}", None),
+        ("queries.statistics", "GET", f"/queries/statistics?project_id={p}", None),
+        ("queries.export_csv", "GET", f"/queries/export.csv?project_id={p}", None),
+        ("queries.import", "POST", "/queries/import", {"project_id": p, "items": import_items}),
+        # у каждого запроса свой срез строк — как у разных редакторов, без блокировок друг на друге
+        ("queries.bulk", "POST", f"/queries/bulk?project_id={p}",
+         lambda n: {"ids": sample_ids[(n * BULK_BATCH) % len(sample_ids):][:BULK_BATCH], "set_page": f"/bench/{n}"}),
+        ("cluster_registry.list", "GET", f"/cluster-registry?project_id={p}&limit=500", None),
+        ("content_plan.list", "GET", f"/content-plan?project_id={p}&limit=50", None),
+        ("content_plan.search", "GET", f"/content-plan?project_id={p}&limit=50&search=кариес", None),
+        ("analytics.report", "GET", f"/analytics/report?project_id={p}", None),
+    ]
+
+
+async def _measure(client, method, path, body, requests: int, concurrency: int, warmup: int):
+    counter = itertools.count()
+
+    async def one():
+        payload = body(next(counter)) if callable(body) else body
+        t0 = time.perf_counter()
+        r = await client.request(method, path, json=payload)
+        await r.aread()
+        return (time.perf_counter() - t0) * 1000, r.status_code
+
+    for _ in range(warmup):
+        await one()
+
+    sem = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def run():
+        nonlocal errors
+        async with sem:
+            ms, status = await one()
+            latencies.append(ms)
+            if status >= 400:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(run() for _ in range(requests)))
+    wall = time.perf_counter() - t0
+    return {
+        "n": len(latencies),
+        "errors": errors,
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(_pct(latencies, 95), 2),
+        "max_ms": round(max(latencies), 2),
+        "rps": round(len(latencies) / wall, 2),
+    }
+
+
+def _compare(results: dict, baseline: dict, max_regression: float, min_delta_ms: float) -> list[str]:
+    failures = []
+    for size, cases in results.items():
+        base_cases = baseline.get(size, {})
+        for name, r in cases.items():
+            b = base_cases.get(name)
+            if not b:
+                continue
+            delta = r["p95_ms"] - b["p95_ms"]
+            if delta > min_delta_ms and r["p95_ms"] > b["p95_ms"] * (1 + max_regression):
+                failures.append(f"{size} {name}: p95 {b['p95_ms']} -> {r['p95_ms']} ms")
+            if r["errors"] and not b.get("errors"):
+                failures.append(f"{size} {name}: {r['errors']} ошибок")
+    return failures
+
+
+async def main(args) -> int:
+    import httpx
+    from sqlalchemy import select
+    from app.db import SessionLocal, close_db_connections
+    from app.main import app
+    from app.models import Query
+    from app.security import create_access_token
+    from app.tools.seed import ensure_owner
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    only = set(args.only.split(",")) if args.only else None
+    results: dict[str, dict] = {}
+
+    projects = await _ensure_projects(sizes, args.reseed)
+    user_id = await ensure_owner(BENCH_EMAIL)
+    async with SessionLocal() as db:
+        samples = {}
+        for size, pid in projects.items():
+            ids = (await db.execute(
+                select(Query.id).where(Query.project_id == pid).order_by(Query.id).limit(BULK_BATCH * BULK_SLICES)
+            )).scalars().all()
+            samples[size] = [str(i) for i in ids]
+
+    headers = {"Authorization": f"Bearer {create_access_token(user_id)}"}
+    # исключение в приложении — это 500 в отчёте, а не падение бенчмарка
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers, timeout=600) as client:
+        print(f"{'size':>8} {'endpoint':<24} {'n':>4} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'rps':>8}")
+        for size, pid in projects.items():
+            results[str(size)] = {}
+            for name, method, path, body in _cases(pid, samples[size]):
+                if only and name not in only:
+                    continue
+                r = await _measure(client, method, path, body, args.requests, args.concurrency, args.warmup)
+                results[str(size)][name] = r
+                print(f"{size:>8} {name:<24} {r['n']:>4} {r['errors']:>4} {r['p50_ms']:>9.1f} "
+                      f"{r['p95_ms']:>9.1f} {r['rps']:>8.1f}")
+    await close_db_connections()
+
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "host": platform.node(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"Результаты: {out}")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+        print(f"Базовая линия сохранена: {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print(f"Базовой линии нет ({baseline_path}) — сравнение пропущено")
+        return 0
+
+    failures = _compare(results, json.loads(baseline_path.read_text())["results"],
+                        args.max_regression, args.min_delta_ms)
+    if failures:
+        print("FAIL: регрессии относительно базовой линии:")
+        for f in failures:
+            print(f"  {f}")
+        return 1
+    print("OK: регрессий относительно базовой линии нет")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10000,100000", help="Размеры проектов через запятую (1000000 — отдельно, долго)")
+    parser.add_argument("--only", default=None, help="Только эти эндпоинты (имена через запятую)")
+    parser.add_argument("--requests", type=int, default=30, help="Запросов на эндпоинт")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--reseed", action="store_true", help="Пересоздать бенч-проекты")
+    parser.add_argument("--out", default=os.getenv("BENCH_OUT", str(HERE / "results" / "endpoints.json")))
+    parser.add_argument("--baseline", default=str(HERE / "baselines" / "endpoints.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="Записать результат как базовую линию")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Допустимый рост p95 (доля)")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="Рост p95 меньше этого не считается регрессией")
+    sys.exit(asyncio.run(main(parser.parse_args())))
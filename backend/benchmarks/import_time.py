@@ -0,0 +1,85 @@
+"""
+Регрессия времени импорта API (python -X importtime).
+
+Импортирует app.main в чистом интерпретаторе и проверяет, что
+  * суммарное время импорта не превышает лимит;
+  * тяжёлые подсистемы (парсер врачей, pandas, Excel) не грузятся при старте API.
+
+    cd backend && python -m benchmarks.import_time --max-ms 1500
+
+Проверка тяжёлых модулей (и грубый потолок времени) входит в pytest —
+tests/test_import_time.py.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Модули, которые не должны попадать в импорт API-воркера
+HEAVY_MODULES = ("pyppeteer", "bs4", "lxml", "pandas", "numpy", "openpyxl", "aiohttp")
+
+
+def measure(target: str, runs: int) -> tuple[float, dict[str, int]]:
+    """Минимальное по runs время импорта target (мс) и cumulative-время модулей верхнего уровня (мкс)."""
+    best_ms = float("inf")
+    modules: dict[str, int] = {}
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        if proc.returncode != 0:
+            raise SystemExit(f"Импорт {target} упал:\n{proc.stderr[-2000:]}")
+
+        run_modules: dict[str, int] = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            try:
+                _, cumulative, name = line[len("import time:"):].split("|")
+                cum_us = int(cumulative)
+            except ValueError:
+                continue  # заголовок
+            run_modules[name.strip()] = cum_us
+        total_ms = run_modules.get(target, 0) / 1000
+        if total_ms < best_ms:
+            best_ms, modules = total_ms, run_modules
+    return best_ms, modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target", default="app.main")
+    parser.add_argument("--max-ms", type=float, default=float(os.getenv("IMPORT_TIME_MAX_MS", 1500)))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    total_ms, modules = measure(args.target, args.runs)
+
+    print(f"{args.target}: {total_ms:.0f}ms (лучший из {args.runs}, лимит {args.max_ms:.0f}ms)")
+    app_modules = sorted(
+        ((name, us) for name, us in modules.items() if name.startswith("app.")),
+        key=lambda x: -x[1],
+    )
+    for name, us in app_modules[: args.top]:
+        print(f"  {us / 1000:>8.1f}ms  {name}")
+
+    failed = False
+    heavy = sorted({name for name in modules if name.split(".")[0] in HEAVY_MODULES})
+    if heavy:
+        roots = sorted({name.split(".")[0] for name in heavy})
+        print(f"FAIL: при старте API импортируются тяжёлые модули: {', '.join(roots)}")
+        failed = True
+    if total_ms > args.max_ms:
+        print(f"FAIL: импорт {total_ms:.0f}ms > {args.max_ms:.0f}ms")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""
+Нагрузочные сценарии: реальная смесь пользователей против всего API.
+
+Виртуальные пользователи трёх типов работают параллельно --duration секунд:
+  * editors   — листают и фильтруют грид запросов, считают, правят пачками;
+  * importers — периодически импортируют пачки запросов;
+  * analysts  — обновляют аналитику, статистику и реестр кластеров.
+
+По каждому сценарию — p50/p95/p99, доля ошибок и RPS; параллельно раз в
+--pool-interval секунд снимается заполненность пула БД (из /ready).
+Нарушение SLO (--slo-file или значения по умолчанию ниже) — код возврата 1.
+
+По умолчанию приложение поднимается in-process на DATABASE_URL; с --base-url
+нагрузка идёт на запущенный стек (токен подписывается тем же SECRET_KEY,
+поэтому скрипт запускают с тем же .env, что и API).
+
+    cd backend && python -m benchmarks.load --editors 20 --importers 2 --analysts 3 --duration 60
+    cd backend && python -m benchmarks.load --base-url http://localhost:8000 --slo-file slo.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+LOAD_EMAIL = "bench-load@example.com"
+IMPORT_BATCH = 500
+BULK_BATCH = 20
+PAGE_SIZE = 50
+
+# scenario -> пороги; pool — по всему прогону
+DEFAULT_SLO = {
+    "editors": {"p95_ms": 500, "p99_ms": 1500, "error_rate": 0.01},
+    "importers": {"p95_ms": 5000, "error_rate": 0.01},
+    "analysts": {"p95_ms": 3000, "error_rate": 0.01},
+    "pool": {"max_saturation": 0.9},
+}
+
+
+def _pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+@dataclass
+class Recorder:
+    # scenario -> [(endpoint, ms, status)]
+    samples: dict = field(default_factory=lambda: defaultdict(list))
+    pool: list = field(default_factory=list)
+
+    async def call(self, client, scenario: str, endpoint: str, method: str, path: str, body=None):
+        t0 = time.perf_counter()
+        try:
+            r = await client.request(method, path, json=body)
+            await r.aread()
+            status = r.status_code
+        except Exception:
+            r, status = None, 599
+        self.samples[scenario].append((endpoint, (time.perf_counter() - t0) * 1000, status))
+        return r
+
+
+# ---------------- Сценарии ----------------
+async def editor(n: int, client, rec: Recorder, pid: str, ids: list, total: int, stop: asyncio.Event, think: float):
+    rng = random.Random(n)
+    # свой срез строк: редакторы не правят одно и то же
+    own = ids[n * BULK_BATCH:(n + 1) * BULK_BATCH] or ids[:BULK_BATCH]
+    pages = max(1, min(total, 10_000) // PAGE_SIZE)
+    i = 0
+    while not stop.is_set():
+        i += 1
+        offset = rng.randrange(pages) * PAGE_SIZE
+        await rec.call(client, "editors", "queries.list", "GET",
+                       f"/queries?project_id={pid}&limit={PAGE_SIZE}&offset={offset}")
+        if i % 4 == 0:
+            await rec.call(client, "editors", "queries.count", "GET", f"/queries/count?project_id={pid}")
+        if i % 6 == 0:
+            await rec.call(client, "editors", "queries.search", "GET",
+                           f"/queries?project_id={pid}&limit={PAGE_SIZE}&search={rng.choice(('лечение', 'цена', 'москва'))}")
+        if i % 5 == 0:
+            await rec.call(client, "editors", "queries.bulk", "POST", f"/queries/bulk?project_id={pid}",
+                           {"ids": own, "set_page": f"/load/{n}/{i}"})
+        await asyncio.sleep(think * rng.uniform(0.5, 1.5))
+
+
+async def importer(n: int, client, rec: Recorder, pid: str, stop: asyncio.Event, think: float):
+    rng = random.Random(1000 + n)
+    items = [{"phrase": f"нагрузка импорт {n} {k}", "direction": "Нагрузка", "ws_flag": k} for k in range(IMPORT_BATCH)]
+    while not stop.is_set():
+        await rec.call(client, "importers", "queries.import", "POST", "/queries/import",
+                       {"project_id": pid, "items": items})
+        await asyncio.sleep(think * 10 * rng.uniform(0.5, 1.5))
+
+
+async def analyst(n: int, client, rec: Recorder, pid: str, stop: asyncio.Event, think: float):
+    rng = random.Random(2000 + n)
+    while not stop.is_set():
+        await rec.call(client, "analysts", "analytics.report", "GET", f"/analytics/report?project_id={pid}")
+        await rec.call(client, "analysts", "queries.statistics", "GET", f"/queries/statistics?project_id={pid}")
+        await rec.call(client, "analysts", "cluster_registry.list", "GET", f"/cluster-registry?project_id={pid}&limit=500")
+        await asyncio.sleep(think * 5 * rng.uniform(0.5, 1.5))
+
+
+async def pool_sampler(client, rec: Recorder, stop: asyncio.Event, interval: float):
+    while not stop.is_set():
+        try:
+            # /ready отдаёт пул и при 503 (in-process lifespan не запускается)
+            pool = (await client.get("/ready")).json()["pool"]
+            capacity = pool["size"] + pool["max_overflow"]
+            rec.pool.append(pool["checked_out"] / capacity if capacity else 0.0)
+        except Exception:
+            pass
+        await asyncio.sleep(interval)
+
+
+# ---------------- Отчёт ----------------
+def _summarize(rec: Recorder, duration: float) -> dict:
+    report = {}
+    for scenario, samples in rec.samples.items():
+        lat = [ms for _, ms, _ in samples]
+        errors = sum(1 for _, _, status in samples if status >= 400)
+        endpoints = defaultdict(list)
+        for ep, ms, _ in samples:
+            endpoints[ep].append(ms)
+        report[scenario] = {
+            "requests": len(samples),
+            "errors": errors,
+            "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+            "rps": round(len(samples) / duration, 2),
+            "p50_ms": round(statistics.median(lat), 1) if lat else 0.0,
+            "p95_ms": round(_pct(lat, 95), 1),
+            "p99_ms": round(_pct(lat, 99), 1),
+            "endpoints": {ep: {"n": len(v), "p95_ms": round(_pct(v, 95), 1)} for ep, v in sorted(endpoints.items())},
+        }
+    report["pool"] = {
+        "samples": len(rec.pool),
+        "mean_saturation": round(statistics.fmean(rec.pool), 3) if rec.pool else 0.0,
+        "max_saturation": round(max(rec.pool), 3) if rec.pool else 0.0,
+    }
+    return report
+
+
+def _check_slo(report: dict, slo: dict) -> list[str]:
+    failures = []
+    for scenario, limits in slo.items():
+        got = report.get(scenario)
+        if not got:
+            continue
+        for key, limit in limits.items():
+            if key in got and got[key] > limit:
+                failures.append(f"{scenario}.{key} = {got[key]} > {limit}")
+    return failures
+
+
+async def main(args) -> int:
+    import httpx
+    from app.db import SessionLocal, close_db_connections
+    from app.models import Query
+    from app.security import create_access_token
+    from app.tools.seed import SeedOptions, ensure_owner, seed
+    from sqlalchemy import select
+
+    [ps] = await seed(1, SeedOptions(queries=args.queries, content_plan=max(1, args.queries // 10)),
+                      owner_email=LOAD_EMAIL, prefix="load")
+    user_id = await ensure_owner(LOAD_EMAIL)
+    async with SessionLocal() as db:
+        ids = [str(i) for i in (await db.execute(
+            select(Query.id).where(Query.project_id == ps.project_id).order_by(Query.id).limit(BULK_BATCH * args.editors)
+        )).scalars()]
+    pid = str(ps.project_id)
+
+    headers = {"Authorization": f"Bearer {create_access_token(user_id)}"}
+    if args.base_url:
+        await close_db_connections()
+        transport, base_url = None, args.base_url
+    else:
+        from app.main import app
+        transport, base_url = httpx.ASGITransport(app=app, raise_app_exceptions=False), "http://load"
+
+    slo = json.loads(Path(args.slo_file).read_text()) if args.slo_file else DEFAULT_SLO
+    rec = Recorder()
+    stop = asyncio.Event()
+    think = args.think_ms / 1000
+    limits = httpx.Limits(max_connections=args.editors + args.importers + args.analysts + 5)
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, headers=headers,
+                                 timeout=120, limits=limits) as client:
+        tasks = [asyncio.create_task(editor(n, client, rec, pid, ids, args.queries, stop, think))
+                 for n in range(args.editors)]
+        tasks += [asyncio.create_task(importer(n, client, rec, pid, stop, think)) for n in range(args.importers)]
+        tasks += [asyncio.create_task(analyst(n, client, rec, pid, stop, think)) for n in range(args.analysts)]
+        tasks.append(asyncio.create_task(pool_sampler(client, rec, stop, args.pool_interval)))
+
+        t0 = time.perf_counter()
+        await asyncio.sleep(args.duration)
+        stop.set()
+        await asyncio.gather(*tasks)
+        duration = time.perf_counter() - t0
+    if not args.base_url:
+        await close_db_connections()
+
+    report = _summarize(rec, duration)
+    print(f"{'scenario':<10} {'req':>6} {'err %':>6} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for scenario in ("editors", "importers", "analysts"):
+        r = report.get(scenario)
+        if r:
+            print(f"{scenario:<10} {r['requests']:>6} {r['error_rate'] * 100:>6.2f} {r['rps']:>7.1f} "
+                  f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+    pool = report["pool"]
+    print(f"pool saturation: mean {pool['mean_saturation']:.2f}, max {pool['max_saturation']:.2f} "
+          f"({pool['samples']} замеров)")
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({"args": vars(args), "slo": slo, "report": report}, ensure_ascii=False, indent=2))
+    print(f"Результаты: {out}")
+
+    failures = _check_slo(report, slo)
+    if failures:
+        print("FAIL: нарушены SLO:")
+        for f in failures:
+            print(f"  {f}")
+        return 1
+    print("OK: SLO выполнены")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--editors", type=int, default=20)
+    parser.add_argument("--importers", type=int, default=2)
+    parser.add_argument("--analysts", type=int, default=3)
+    parser.add_argument("--duration", type=float, default=60.0, help="Секунд нагрузки")
+    parser.add_argument("--think-ms", type=float, default=200.0, help="Пауза пользователя между действиями")
+    parser.add_argument("--queries", type=int, default=100_000, help="Размер проекта (сеется один раз)")
+    parser.add_argument("--pool-interval", type=float, default=0.5)
+    parser.add_argument("--base-url", default=None, help="Нагружать запущенный API вместо in-process")
+    parser.add_argument("--slo-file", default=None, help="JSON с порогами в формате DEFAULT_SLO")
+    parser.add_argument("--out", default=os.getenv("BENCH_OUT", str(HERE / "results" / "load.json")))
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,113 @@
+"""
+Задержка API во время «шторма логинов».
+
+Поднимает приложение in-process (httpx + ASGITransport) на базе из DATABASE_URL,
+создаёт пользователя с паролем и меряет:
+  * задержку лёгкого запроса (GET /) и лаг event loop в покое;
+  * то же самое, пока параллельно идут N логинов (bcrypt).
+
+Если хэширование блокирует event loop, p95 во время шторма растёт на сотни мс.
+
+    cd backend && python -m benchmarks.login_storm --logins 50 --concurrency 20
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+
+
+def _pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+async def _probe(client, stop: asyncio.Event, out: list, lag: list, interval: float = 0.01):
+    """Лёгкие запросы подряд + лаг event loop (насколько опоздал sleep)."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await client.get("/")
+        out.append((time.perf_counter() - t0) * 1000)
+
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag.append(max(0.0, (loop.time() - expected) * 1000))
+
+
+async def _phase(client, seconds: float | None = None, storm=None):
+    stop = asyncio.Event()
+    lat, lag = [], []
+    probe = asyncio.create_task(_probe(client, stop, lat, lag))
+    if storm is not None:
+        await storm
+    else:
+        await asyncio.sleep(seconds)
+    stop.set()
+    await probe
+    return lat, lag
+
+
+async def main(args) -> int:
+    import httpx
+    from app.main import app
+    from app.db import SessionLocal
+    from app.models import User
+    from app.security import hash_password
+
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    password = "bench-password"
+    async with SessionLocal() as db:
+        db.add(User(id=uuid.uuid4(), email=email, password_hash=await hash_password(password), is_active=True))
+        await db.commit()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        idle_lat, idle_lag = await _phase(client, seconds=args.idle_seconds)
+
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def login():
+            async with sem:
+                r = await client.post("/auth/login", data={"username": email, "password": password})
+                r.raise_for_status()
+
+        async def storm():
+            t0 = time.perf_counter()
+            await asyncio.gather(*(login() for _ in range(args.logins)))
+            return time.perf_counter() - t0
+
+        storm_task = asyncio.ensure_future(storm())
+        storm_lat, storm_lag = await _phase(client, storm=storm_task)
+        storm_seconds = storm_task.result()
+
+    rows = [
+        ("idle", idle_lat, idle_lag),
+        ("login storm", storm_lat, storm_lag),
+    ]
+    print(f"{'phase':<12} {'n':>5} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'lag p95':>8}")
+    for name, lat, lag in rows:
+        print(f"{name:<12} {len(lat):>5} {statistics.median(lat):>8.1f} {_pct(lat, 95):>8.1f} "
+              f"{max(lat):>8.1f} {_pct(lag, 95):>8.1f}")
+    print(f"{args.logins} логинов за {storm_seconds:.2f}s ({args.logins / storm_seconds:.1f}/s)")
+
+    # «Плоская» задержка: p95 во время шторма не дальше порога от покоя
+    degradation = _pct(storm_lat, 95) - _pct(idle_lat, 95)
+    if degradation > args.max_p95_increase_ms:
+        print(f"FAIL: p95 вырос на {degradation:.1f}ms (> {args.max_p95_increase_ms}ms)")
+        return 1
+    print(f"OK: p95 вырос на {degradation:.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--idle-seconds", type=float, default=2.0)
+    parser.add_argument("--max-p95-increase-ms", type=float, default=50.0)
+    sys.exit(asyncio.run(main(parser.parse_args())))
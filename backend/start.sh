@@ -48,9 +48,10 @@ for i in range(10):
         time.sleep(1)
 PY
 
-# Применяем миграции Alembic
-echo "🔄 Применение миграций..."
-alembic upgrade head
+# Миграции применяет само приложение при старте (AUTO_MIGRATE, см. app/migrations.py):
+# без лишнего запуска alembic и под advisory lock — безопасно для нескольких воркеров
 
 echo "🎯 Запуск FastAPI сервера..."
-exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --log-level info
\ No newline at end of file
+# Роли/права хранятся в БД, кэш прав сверяется с users.permissions_version —
+# можно поднимать несколько воркеров (WEB_CONCURRENCY)
+exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --log-level info --workers "${WEB_CONCURRENCY:-1}"
\ No newline at end of file
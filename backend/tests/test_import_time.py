@@ -0,0 +1,12 @@
+from benchmarks.import_time import HEAVY_MODULES, measure
+
+# щедрый потолок: от CI-машины не зависит, ловит только грубые регрессии;
+# точный лимит — python -m benchmarks.import_time --max-ms
+MAX_MS = 5000
+
+
+def test_api_import_skips_heavy_modules():
+    total_ms, modules = measure("app.main", runs=1)
+    heavy = sorted({name.split(".")[0] for name in modules} & set(HEAVY_MODULES))
+    assert not heavy, f"при старте API импортируются тяжёлые модули: {', '.join(heavy)}"
+    assert total_ms < MAX_MS
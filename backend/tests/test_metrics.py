@@ -0,0 +1,75 @@
+from app.metrics import statement_shape
+
+
+def test_cast_does_not_swallow_following_sql():
+    a = statement_shape(
+        "SELECT project_members.role FROM project_members "
+        "WHERE project_members.user_id = $1::UUID AND project_members.project_id = $2::UUID"
+    )
+    b = statement_shape(
+        "SELECT project_members.role FROM project_members "
+        "WHERE project_members.user_id = $1::UUID AND project_members.role = $2::VARCHAR"
+    )
+    assert a == (
+        "SELECT project_members.role FROM project_members "
+        "WHERE project_members.user_id = ? AND project_members.project_id = ?"
+    )
+    assert a != b
+
+
+def test_multiword_and_array_casts():
+    assert statement_shape("SELECT $1::TIMESTAMP WITH TIME ZONE, $2::double precision, $3::UUID[]") == "SELECT ?, ?, ?"
+
+
+def test_in_list_collapses():
+    assert statement_shape("SELECT 1 WHERE id IN ($1::UUID, $2::UUID, $3::UUID)") == "SELECT 1 WHERE id IN (?)"
+
+
+def test_background_task_not_counted_in_request_metrics():
+    import time
+
+    from fastapi import BackgroundTasks, FastAPI
+    from fastapi.testclient import TestClient
+    from prometheus_client import REGISTRY
+
+    from app.metrics import MetricsMiddleware, current_request_stats
+
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0.0
+
+    seen = {}
+
+    def background():
+        seen["stats"] = current_request_stats()
+        seen["in_progress"] = sample("http_requests_in_progress", method="GET")
+        seen["count"] = sample("http_request_duration_seconds_count", method="GET", route="/bg")
+        time.sleep(0.3)
+
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/bg")
+    async def bg(background_tasks: BackgroundTasks):
+        background_tasks.add_task(background)
+        return {"ok": True}
+
+    count_before = sample("http_request_duration_seconds_count", method="GET", route="/bg")
+    sum_before = sample("http_request_duration_seconds_sum", method="GET", route="/bg")
+    in_progress_before = sample("http_requests_in_progress", method="GET")
+
+    with TestClient(app) as client:
+        assert client.get("/bg").status_code == 200
+
+    # к началу фоновой задачи запрос уже записан и снят с in-flight
+    assert seen["stats"] is None
+    assert seen["count"] == count_before + 1
+    assert seen["in_progress"] == in_progress_before
+    assert sample("http_request_duration_seconds_sum", method="GET", route="/bg") - sum_before < 0.3
+    assert sample("http_requests_total", method="GET", route="/bg", status="200") >= 1
+
+
+def test_cast_type_modifiers_are_stripped():
+    assert statement_shape("UPDATE t SET name = $1::VARCHAR(255), price = $2::NUMERIC(10, 2)") == (
+        "UPDATE t SET name = ?, price = ?"
+    )
+    assert statement_shape("SELECT $1::character varying(64)[], $2::timestamp without time zone") == "SELECT ?, ?"
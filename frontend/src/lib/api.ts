@@ -143,19 +143,58 @@ export async function globalDeleteApply(args: {
 
 /* ---------------- Cluster Registry ---------------- */
 
-export async function listClusterRegistry(project_id: string) {
-    const r = await api.get("/cluster-registry", { params: { project_id } });
-    return r.data as Array<{
-        id: string;
-        project_id: string;
-        name: string;
-        direction?: string;
-        page_type?: string;
-        has_core: boolean;
-        has_brief: boolean;
-        is_published: boolean;
-        demand: number;
-    }>;
+export type ClusterRegistryRow = {
+    id: string;
+    project_id: string;
+    name: string;
+    direction?: string;
+    page_type?: string;
+    has_core: boolean;
+    has_brief: boolean;
+    is_published: boolean;
+    demand: number;
+};
+
+export type ClusterRegistryFilters = {
+    direction?: string;
+    page_type?: string;
+    has_core?: boolean;
+    has_brief?: boolean;
+    is_published?: boolean;
+    demand_min?: number;
+    demand_max?: number;
+    search?: string;
+};
+
+// Одна страница реестра (keyset): total и курсор приходят в заголовках
+export async function listClusterRegistryPage(
+    project_id: string,
+    opts: ClusterRegistryFilters & { cursor?: string; limit?: number; with_total?: boolean } = {}
+) {
+    const r = await api.get<ClusterRegistryRow[]>("/cluster-registry", { params: { project_id, ...opts } });
+    const total = r.headers["x-total-count"];
+    return {
+        items: r.data,
+        total: total !== undefined ? Number(total) : undefined,
+        nextCursor: (r.headers["x-next-cursor"] as string | undefined) || undefined,
+    };
+}
+
+// Весь реестр проекта (проходит по всем страницам)
+export async function listClusterRegistry(project_id: string, filters: ClusterRegistryFilters = {}) {
+    const rows: ClusterRegistryRow[] = [];
+    let cursor: string | undefined;
+    do {
+        const page = await listClusterRegistryPage(project_id, {
+            ...filters,
+            cursor,
+            limit: 5000,
+            with_total: false,
+        });
+        rows.push(...page.items);
+        cursor = page.nextCursor;
+    } while (cursor);
+    return rows;
 }
 
 export async function upsertClusterRegistryRow(row: {